@@ -67,7 +67,7 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
-    "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "AUTH_TOKEN_CLASSES": ("users.utils.auth.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
     "JTI_CLAIM": "jti",
     "AUTH_COOKIE": "cc_access",
@@ -77,6 +77,101 @@ SIMPLE_JWT = {
     "AUTH_COOKIE_SECURE": False,
 }
 
+# Concurrent refreshes of one session share a result for COALESCE_WINDOW seconds;
+# a just-rotated mobile refresh token stays answerable for GRACE_PERIOD seconds.
+TOKEN_REFRESH = {
+    "COALESCE_WINDOW": env.int("TOKEN_REFRESH_COALESCE_WINDOW", default=5),
+    "GRACE_PERIOD": env.int("TOKEN_REFRESH_GRACE_PERIOD", default=30),
+}
+
+# Revoked jtis are mirrored in memory (Bloom filter + exact set) and synced
+# from the RevokedTokens table every SYNC_INTERVAL seconds.
+TOKEN_REVOCATION = {
+    "CAPACITY": env.int("TOKEN_REVOCATION_CAPACITY", default=100000),
+    "ERROR_RATE": env.float("TOKEN_REVOCATION_ERROR_RATE", default=0.01),
+    "SYNC_INTERVAL": env.float("TOKEN_REVOCATION_SYNC_INTERVAL", default=2.0),
+}
+
+# Asymmetric JWT signing (RS256/EdDSA). Every *.pem in KEYS_DIR is published in
+# the JWKS document; the last one by name signs. Falls back to HS256 when unset.
+JWT_SIGNING = {
+    "KEYS_DIR": env.str("JWT_KEYS_DIR", default=None),
+    "JWKS_MAX_AGE": env.int("JWKS_MAX_AGE", default=300),
+}
+
+# Maximum number of tokens plus session ids accepted by /introspect/
+INTROSPECTION_MAX_ITEMS = env.int("INTROSPECTION_MAX_ITEMS", default=1000)
+
+# Credentials accepted from peer services ("Authorization: Service <token>")
+SERVICE_TOKENS = env.list("SERVICE_TOKENS", default=[])
+
+# Auth caches (in process, optionally shared through a Django CACHES alias)
+AUTH_CACHE = {
+    "ALIAS": env.str("AUTH_CACHE_ALIAS", default=None),
+    "LOCAL_TTL": env.int("AUTH_CACHE_LOCAL_TTL", default=5),
+    "SESSION_TTL": env.int("SESSION_CACHE_TTL", default=60),
+    "PRINCIPAL_TTL": env.int("PRINCIPAL_CACHE_TTL", default=300),
+    "CLAIMS_TTL": env.int("CLAIMS_CACHE_TTL", default=86400),
+}
+
+# Login attempts allowed per client IP and per email/phone, each within a
+# sliding window in seconds (shared across workers through AUTH_CACHE's alias)
+LOGIN_THROTTLE = {
+    "IP_LIMIT": env.int("LOGIN_THROTTLE_IP_LIMIT", default=30),
+    "IP_WINDOW": env.int("LOGIN_THROTTLE_IP_WINDOW", default=60),
+    "IDENTIFIER_LIMIT": env.int("LOGIN_THROTTLE_IDENTIFIER_LIMIT", default=5),
+    "IDENTIFIER_WINDOW": env.int("LOGIN_THROTTLE_IDENTIFIER_WINDOW", default=300),
+}
+
+# Keyset pagination of user listings (clients may ask for up to MAX_PAGE_SIZE)
+USER_PAGINATION = {
+    "PAGE_SIZE": env.int("USER_PAGE_SIZE", default=50),
+    "MAX_PAGE_SIZE": env.int("USER_MAX_PAGE_SIZE", default=500),
+}
+
+# Number of results returned by /users/search/ by default and at most
+USER_SEARCH = {
+    "LIMIT": env.int("USER_SEARCH_LIMIT", default=10),
+    "MAX_LIMIT": env.int("USER_SEARCH_MAX_LIMIT", default=50),
+}
+
+# Rows fetched per server-side cursor round trip by the user export
+USER_EXPORT_CHUNK_SIZE = env.int("USER_EXPORT_CHUNK_SIZE", default=2000)
+
+# Bulk provisioning: rows accepted per request and rows inserted per batch
+BULK_PROVISIONING = {
+    "MAX_USERS": env.int("BULK_PROVISIONING_MAX_USERS", default=5000),
+    "BATCH_SIZE": env.int("BULK_PROVISIONING_BATCH_SIZE", default=500),
+}
+
+# Rows deleted per statement when purging a deleted user's data
+USER_PURGE_BATCH_SIZE = env.int("USER_PURGE_BATCH_SIZE", default=1000)
+
+# Memberships removed per transaction when offboarding a tenant
+TENANT_OFFBOARDING_BATCH_SIZE = env.int("TENANT_OFFBOARDING_BATCH_SIZE", default=500)
+
+# In-memory membership index behind the batch membership check
+MEMBERSHIP_INDEX = {
+    "SYNC_INTERVAL": env.float("MEMBERSHIP_INDEX_SYNC_INTERVAL", default=2.0),
+    "SYNC_OVERLAP": env.int("MEMBERSHIP_INDEX_SYNC_OVERLAP", default=5),
+    "REBUILD_INTERVAL": env.int("MEMBERSHIP_INDEX_REBUILD_INTERVAL", default=3600),
+    "MAX_PAIRS": env.int("MEMBERSHIP_CHECK_MAX_PAIRS", default=10000),
+}
+
+# Region assumed for phone numbers entered without a country code
+PHONE_DEFAULT_REGION = env.str("PHONE_DEFAULT_REGION", default="US")
+
+# Password hashing pool (WORKERS=0 hashes inline on the request thread)
+PASSWORD_HASHING = {
+    "WORKERS": env.int("PASSWORD_HASHING_WORKERS", default=2),
+    "QUEUE_DEPTH": env.int("PASSWORD_HASHING_QUEUE_DEPTH", default=32),
+    "TIMEOUT": env.float("PASSWORD_HASHING_TIMEOUT", default=5.0),
+    # Separate pool for bulk provisioning and imports, so they never take
+    # the workers logins need; passwords are hashed CHUNK_SIZE per job.
+    "PROVISIONING_WORKERS": env.int("PASSWORD_HASHING_PROVISIONING_WORKERS", default=1),
+    "PROVISIONING_CHUNK_SIZE": env.int("PASSWORD_HASHING_PROVISIONING_CHUNK_SIZE", default=50),
+}
+
 # Database settings
 DATABASES = {
     "default": {
@@ -118,7 +213,20 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 
-TENANT_API_URL = "http://service-api:8000/api/tenant/"
+# Tenant service client (users.utils.tenants.client)
+TENANT_SERVICE = {
+    "URL": env.str("TENANT_API_URL", default="http://service-api:8000/api/tenant/"),
+    "CONNECT_TIMEOUT": env.float("TENANT_API_CONNECT_TIMEOUT", default=1.0),
+    "READ_TIMEOUT": env.float("TENANT_API_READ_TIMEOUT", default=3.0),
+    "RETRIES": env.int("TENANT_API_RETRIES", default=3),
+    "BACKOFF": env.float("TENANT_API_BACKOFF", default=0.2),
+    "BACKOFF_JITTER": env.float("TENANT_API_BACKOFF_JITTER", default=0.2),
+    "POOL_SIZE": env.int("TENANT_API_POOL_SIZE", default=10),
+    "CACHE_TTL": env.int("TENANT_CACHE_TTL", default=300),
+    "STALE_TTL": env.int("TENANT_CACHE_STALE_TTL", default=600),
+    "BATCH_SIZE": env.int("TENANT_API_BATCH_SIZE", default=100),
+}
+TENANT_API_URL = TENANT_SERVICE["URL"]
 
 # Security settings
 SESSION_COOKIE_SECURE = True
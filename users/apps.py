@@ -1,5 +1,5 @@
 from django.apps import AppConfig
-from django.db.models.signals import pre_migrate
+from django.db.models.signals import pre_migrate, post_migrate
 from django.db import connection
 
 
@@ -11,9 +11,16 @@ class UsersConfig(AppConfig):
         import users.signals
 
         pre_migrate.connect(create_schema, sender=self)
+        post_migrate.connect(create_search_indexes, sender=self)
 
 
 def create_schema(sender, **kwargs):
     schema_name = "users_api"
     with connection.cursor() as cursor:
         cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema_name};")
+
+
+def create_search_indexes(sender, using="default", **kwargs):
+    from users.utils.search.users import create_search_indexes
+
+    create_search_indexes(using)
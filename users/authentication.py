@@ -1,12 +1,20 @@
+import hmac
+
+from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 from rest_framework.authentication import BaseAuthentication
-from rest_framework_simplejwt.tokens import AccessToken
-from users.models import UserSession
+from users.utils.auth.tokens import AccessToken
+from users.utils.auth.sessions import get_session
+from users.utils.auth.principals import get_principal
+from users.utils.auth.hashing import verify_password
+from users.utils.auth.revocation import is_token_revoked
+from users.utils.auth.epoch import is_token_stale
+from users.utils.auth.identifiers import normalize_identifier
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.response import Response
 
 User = get_user_model()
@@ -19,12 +27,13 @@ class EmailOrPhoneBackend(BaseBackend):
     """
 
     def authenticate(self, request, email_or_phone=None, password=None, **kwargs):
-        user = User.objects.filter(
-            Q(email=email_or_phone) | Q(phone_number=email_or_phone)
-        ).first()
+        identifier = normalize_identifier(email_or_phone)
+        if identifier is None:
+            return None
+        user = User.objects.filter(login_identifiers__value=identifier).first()
 
         # Verify the password
-        if user and user.check_password(password):
+        if user and verify_password(user, password):
             return user
 
         return None
@@ -33,6 +42,35 @@ class EmailOrPhoneBackend(BaseBackend):
         return User.objects.filter(pk=user_id).first()
 
 
+class ServicePrincipal:
+    """The authenticated caller of a service-to-service endpoint."""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+    is_staff = False
+    pk = None
+
+
+# Authentication for peer services presenting a shared credential
+class ServiceAuthentication(BaseAuthentication):
+    keyword = "Service"
+
+    def authenticate(self, request):
+        header = request.META.get("HTTP_AUTHORIZATION", "")
+        keyword, _, token = header.partition(" ")
+        if keyword != self.keyword or not token:
+            return None
+        for accepted in settings.SERVICE_TOKENS:
+            if hmac.compare_digest(token.encode(), accepted.encode()):
+                return ServicePrincipal(), token
+        raise AuthenticationFailed("Invalid service credential")
+
+    def authenticate_header(self, request):
+        # Makes DRF answer unauthenticated calls with 401 instead of 403.
+        return self.keyword
+
+
 # Custom JWT Authentication to handle token errors properly
 class CustomJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -41,6 +79,26 @@ class CustomJWTAuthentication(JWTAuthentication):
         except (InvalidToken, TokenError, AuthenticationFailed):
             return None
 
+    def get_user(self, validated_token):
+        """
+        Resolve the user from the principal cache instead of loading the row.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if not user_id:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if is_token_revoked(validated_token.payload):
+            raise InvalidToken("Token has been revoked")
+
+        user = get_principal(user_id)
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if is_token_stale(validated_token.payload, user.token_epoch):
+            raise InvalidToken("Token has been revoked")
+
+        return user
+
 
 # Custom Cookie Authentication for extracting JWT from HTTP-only cookies & managing sessions
 class CookieAuthentication(BaseAuthentication):
@@ -54,19 +112,21 @@ class CookieAuthentication(BaseAuthentication):
         if session_id:
             print("session_id", session_id)
             try:
-                session = UserSession.objects.get(session_id=session_id)
-
-                # Check if the session is expired
-                if session.is_expired:
-                    print("Session expired")
-                    return self.logout_user(request)
+                session = get_session(session_id)
+            except ValueError:
+                session = None
 
-                request.user_session = session
-
-            except UserSession.DoesNotExist:
+            if session is None:
                 print("Session ID does not exist")
                 return self.logout_user(request)
 
+            # Check if the session is expired
+            if session.is_expired:
+                print("Session expired")
+                return self.logout_user(request)
+
+            request.user_session = session
+
         if not access_token:
             return None
 
@@ -74,12 +134,14 @@ class CookieAuthentication(BaseAuthentication):
             decoded_token = AccessToken(access_token)
             user_id = decoded_token.payload.get("user_id")
 
-            if not user_id:
+            if not user_id or is_token_revoked(decoded_token.payload):
                 return self.logout_user(request)
 
-            user_instance = User.objects.filter(id=user_id).first()
+            user_instance = get_principal(user_id)
 
-            if not user_instance:
+            if not user_instance or not user_instance.is_active:
+                return self.logout_user(request)
+            if is_token_stale(decoded_token.payload, user_instance.token_epoch):
                 return self.logout_user(request)
 
             return user_instance, access_token
@@ -0,0 +1,114 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from users.utils.serialization.rows import get_row_mapper
+
+
+def readable_fields(serializer_class):
+    return [name for name, field in serializer_class().fields.items() if not field.write_only]
+
+
+def requested_fields(request, serializer_class):
+    """
+    The readable fields of ``serializer_class`` selected by ``?fields=a,b``
+    and/or ``?exclude=c``, or None when the request asks for all of them.
+    Deduplicated and in declaration order, so every spelling of one selection
+    maps to the same cached row mapper.
+    """
+    fields = request.query_params.get("fields")
+    exclude = request.query_params.get("exclude")
+    if not fields and not exclude:
+        return None
+
+    available = readable_fields(serializer_class)
+    split = lambda value: [name.strip() for name in (value or "").split(",") if name.strip()]
+    selected = set(split(fields) if fields else available)
+    excluded = set(split(exclude))
+    unknown = sorted((selected | excluded) - set(available))
+    if unknown:
+        raise ValidationError({"fields": f"Unknown field(s): {', '.join(unknown)}"})
+    return [name for name in available if name in selected and name not in excluded]
+
+
+def only_columns(model, serializer_class, fields, extra=()):
+    """
+    Model fields to load for a response limited to ``fields``, for use with
+    ``QuerySet.only``. None if a selected field is not backed by a column
+    (e.g. a method field), in which case the query cannot be narrowed.
+    """
+    serializer_fields = serializer_class().fields
+    columns = {model._meta.pk.name, *extra}
+    for name in fields:
+        source = serializer_fields[name].source
+        try:
+            field = model._meta.get_field(source.split(".")[0])
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete:
+            return None
+        columns.add(field.name)
+    return sorted(columns)
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=`` / ``?exclude=`` for read requests on a generic view: the
+    serializer drops the other fields and ``filter_queryset`` loads only the
+    matching columns. ``sparse_fieldset_columns`` are always loaded (e.g. the
+    pagination key).
+    """
+
+    sparse_fieldset_columns = ()
+
+    def get_sparse_fields(self):
+        if self.request.method not in SAFE_METHODS:
+            return None
+        if not hasattr(self, "_sparse_fields"):
+            self._sparse_fields = requested_fields(self.request, self.get_serializer_class())
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        columns = only_columns(
+            queryset.model, self.get_serializer_class(), fields, self.sparse_fieldset_columns
+        )
+        return queryset if columns is None else queryset.only(*columns)
+
+
+class FastListMixin(SparseFieldsetMixin):
+    """
+    Lists built from ``values()`` rows by a precompiled ``RowMapper`` instead
+    of a serializer per row, with the same output (see
+    ``users.utils.serialization.rows``).
+    """
+
+    def get_row_mapper(self):
+        fields = self.get_sparse_fields()
+        return get_row_mapper(
+            self.get_serializer_class(), None if fields is None else tuple(fields)
+        )
+
+    def fast_list(self, queryset):
+        """The list response for ``queryset``, or None if there is no mapper."""
+        mapper = self.get_row_mapper()
+        if mapper is None:
+            return None
+        columns = dict.fromkeys(
+            [*mapper.columns, queryset.model._meta.pk.name, *self.sparse_fieldset_columns]
+        )
+        rows = queryset.values(*columns)
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response([mapper(row) for row in rows])
+        return self.get_paginated_response([mapper(row) for row in page])
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from users.utils.tenants.members import recount_members
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-tenant member counters from the memberships table"
+
+    def handle(self, *args, **kwargs):
+        tenants = recount_members()
+        self.stdout.write(self.style.SUCCESS(f"Member counts rebuilt for {tenants} tenants."))
@@ -0,0 +1,38 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from users.utils.export.users import FORMATS, export_rows
+
+
+class Command(BaseCommand):
+    help = "Streams every user as NDJSON or CSV to stdout or a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+        parser.add_argument("--tenant", help="Only export members of this tenant id")
+        parser.add_argument("--output", help="File to write to (defaults to stdout)")
+        parser.add_argument("--chunk-size", type=int, help="Rows fetched per round trip")
+
+    def handle(self, *args, **kwargs):
+        tenant = kwargs["tenant"]
+        if tenant:
+            try:
+                tenant = uuid.UUID(tenant)
+            except ValueError:
+                raise CommandError(f"{tenant} is not a valid tenant id.")
+
+        encode, _ = FORMATS[kwargs["format"]]
+        lines = encode(export_rows(tenant, kwargs["chunk_size"]))
+
+        if not kwargs["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        count = 0
+        with open(kwargs["output"], "w", newline="") as output:
+            for line in lines:
+                output.write(line)
+                count += 1
+        if kwargs["format"] == "csv":
+            count -= 1
+        self.stderr.write(self.style.SUCCESS(f"{count} users written to {kwargs['output']}"))
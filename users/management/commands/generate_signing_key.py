@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.utils import timezone
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from pathlib import Path
+from users.utils.auth.keys import load_signing_key
+
+
+class Command(BaseCommand):
+    help = "Generates a new JWT signing key in JWT_KEYS_DIR (it signs once workers reload)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--algorithm",
+            choices=["RS256", "EdDSA"],
+            default="RS256",
+            help="Signing algorithm of the new key",
+        )
+        parser.add_argument(
+            "--dir",
+            default=settings.JWT_SIGNING["KEYS_DIR"],
+            help="Directory holding the PEM key files",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not kwargs["dir"]:
+            raise CommandError("Set JWT_KEYS_DIR or pass --dir.")
+
+        if kwargs["algorithm"] == "EdDSA":
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+        pem = private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        key = load_signing_key(pem)
+
+        keys_dir = Path(kwargs["dir"])
+        keys_dir.mkdir(parents=True, exist_ok=True)
+        path = keys_dir / f"{timezone.now():%Y%m%d%H%M%S}-{key.kid}.pem"
+        path.write_bytes(pem)
+        path.chmod(0o600)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Signing key {key.kid} ({key.algorithm}) written to {path}")
+        )
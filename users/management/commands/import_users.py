@@ -0,0 +1,85 @@
+import itertools
+import json
+import os
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from users.utils.provisioning.importer import merge, prepare, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports users from CSV or NDJSON (email, phone_number, first_name, last_name, "
+        "password or password_hash, tenant_id) in resumable chunks"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file to import")
+        parser.add_argument(
+            "--format", choices=["csv", "ndjson"], help="Defaults to the file extension"
+        )
+        parser.add_argument("--tenant", help="Tenant id for rows without a tenant_id column")
+        parser.add_argument(
+            "--batch-size", type=int, default=10000, help="Rows merged per transaction"
+        )
+        parser.add_argument(
+            "--checkpoint", help="Progress file used to resume (defaults to <path>.checkpoint)"
+        )
+        parser.add_argument(
+            "--restart", action="store_true", help="Ignore an existing checkpoint"
+        )
+
+    def read_checkpoint(self, path):
+        try:
+            with open(path) as checkpoint:
+                return json.load(checkpoint)
+        except FileNotFoundError:
+            return {"rows": 0, "created": 0, "skipped": 0, "invalid": 0}
+
+    def write_checkpoint(self, path, progress):
+        # Replace atomically so an interrupted write never loses the position.
+        with open(f"{path}.tmp", "w") as checkpoint:
+            json.dump(progress, checkpoint)
+        os.replace(f"{path}.tmp", path)
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+        tenant = kwargs["tenant"]
+        if tenant:
+            try:
+                tenant = uuid.UUID(tenant)
+            except ValueError:
+                raise CommandError(f"{tenant} is not a valid tenant id.")
+        fmt = kwargs["format"] or ("csv" if path.endswith(".csv") else "ndjson")
+        checkpoint = kwargs["checkpoint"] or f"{path}.checkpoint"
+        if kwargs["restart"] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        progress = self.read_checkpoint(checkpoint)
+        if progress["rows"]:
+            self.stdout.write(f"Resuming after row {progress['rows']}.")
+
+        rows = itertools.islice(read_rows(path, fmt), progress["rows"], None)
+        started = time.monotonic()
+        imported = 0
+        while chunk := list(itertools.islice(rows, kwargs["batch_size"])):
+            prepared, invalid = prepare(chunk, tenant)
+            created = merge(prepared)
+
+            progress["rows"] += len(chunk)
+            progress["created"] += created
+            progress["skipped"] += len(prepared) - created
+            progress["invalid"] += invalid
+            self.write_checkpoint(checkpoint, progress)
+
+            imported += len(chunk)
+            rate = imported / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f"{progress['rows']} rows: {progress['created']} created, "
+                f"{progress['skipped']} already present, {progress['invalid']} invalid "
+                f"({rate:.0f} rows/s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Import of {path} complete."))
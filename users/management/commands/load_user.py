@@ -1,13 +1,11 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from users.models import AuthUser, UserSettings, UserOrganization
-import requests
+from users.utils.tenants.client import TenantServiceError, tenant_client
 
 UserSettings.objects.all().delete()
 AuthUser.objects.all().delete()
 
-TENANT_API_URL = settings.TENANT_API_URL
-
 
 class Command(BaseCommand):
     help = "Creates a test user if DEBUG=True"
@@ -19,20 +17,14 @@ class Command(BaseCommand):
             )
             return
 
-        response = requests.get(TENANT_API_URL)
-        data = response.json()
-        if response.status_code != 200:
-            self.stdout.write(
-                self.style.ERROR(
-                    f"Tenant API is not reachable. Status code: {response.status_code}"
-                )
-            )
+        try:
+            data = tenant_client.list_tenants()
+        except TenantServiceError as e:
+            self.stdout.write(self.style.ERROR(f"Tenant API is not reachable. {e}"))
             return
 
         if data == []:
-            self.stdout.write(
-                self.style.ERROR(f"Tenant API has no tenants: {response.status_code}")
-            )
+            self.stdout.write(self.style.ERROR("Tenant API has no tenants"))
             return
 
         tenant = data[0]["id"]
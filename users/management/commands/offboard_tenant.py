@@ -0,0 +1,32 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from users.utils.accounts.offboarding import offboard_tenant, request_offboarding
+
+
+class Command(BaseCommand):
+    help = "Removes every membership of a tenant and revokes the sessions of users left without one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("tenant_id", help="Tenant to offboard")
+        parser.add_argument("--batch-size", type=int, help="Memberships removed per transaction")
+
+    def handle(self, *args, **kwargs):
+        try:
+            tenant_id = uuid.UUID(kwargs["tenant_id"])
+        except ValueError:
+            raise CommandError(f"{kwargs['tenant_id']} is not a valid tenant id.")
+
+        offboarding = request_offboarding(tenant_id)
+        if offboarding.completed_at:
+            self.stdout.write(f"Tenant {offboarding.tenant_id} was offboarded at {offboarding.completed_at}")
+            return
+
+        def progress(offboarding):
+            self.stdout.write(
+                f"{offboarding.removed_memberships} memberships removed, "
+                f"{offboarding.orphaned_users} users left without a tenant, "
+                f"{offboarding.revoked_sessions} sessions revoked"
+            )
+
+        offboard_tenant(offboarding, kwargs["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from users.models import UserDeletion
+from users.utils.accounts.deletion import purge_user
+
+
+class Command(BaseCommand):
+    help = "Purges the rows of deleted users in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, help="Rows deleted per statement")
+        parser.add_argument("--limit", type=int, help="Maximum number of users to purge")
+
+    def handle(self, *args, **kwargs):
+        pending = UserDeletion.objects.filter(completed_at__isnull=True).order_by("created_at")
+        if kwargs["limit"]:
+            pending = pending[: kwargs["limit"]]
+        for deletion in pending:
+            purge_user(deletion, kwargs["batch_size"])
+            total = sum(deletion.deleted_rows.values())
+            self.stdout.write(f"Purged user {deletion.user_id} ({total} dependent rows)")
+        self.stdout.write(self.style.SUCCESS("Done."))
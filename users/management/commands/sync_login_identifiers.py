@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from users.models import AuthUser, LoginIdentifier
+from users.utils.auth.identifiers import make_identifiers
+
+
+class Command(BaseCommand):
+    help = "Backfills normalized login identifiers (lowercase email, E.164 phone) for every user"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Users written per INSERT"
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+        before = LoginIdentifier.objects.count()
+        expected = 0
+        batch = []
+
+        users = AuthUser.objects.values_list("id", "email", "phone_number")
+        for user_id, email, phone_number in users.iterator(chunk_size=batch_size):
+            batch.extend(make_identifiers(user_id, email, phone_number))
+            if len(batch) >= batch_size:
+                expected += len(batch)
+                LoginIdentifier.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            expected += len(batch)
+            LoginIdentifier.objects.bulk_create(batch, ignore_conflicts=True)
+
+        total = LoginIdentifier.objects.count()
+        self.stdout.write(
+            self.style.SUCCESS(f"{total - before} login identifiers created ({total} total).")
+        )
+        # Rows that existed already plus values shared by several users.
+        skipped = expected - (total - before)
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{skipped} identifiers skipped (already present or shared with another user)."
+                )
+            )
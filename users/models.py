@@ -30,6 +30,19 @@ class AuthUser(AbstractUser):
     )
     is_email_verified = models.BooleanField(default=False)
     is_phone_verified = models.BooleanField(default=False)
+    token_epoch = models.PositiveIntegerField(
+        default=0, help_text="Bumped to invalidate every token issued to the user."
+    )
+    data_version = models.UUIDField(
+        default=uuid.uuid4,
+        editable=False,
+        help_text="Replaced on every change to the user's profile, settings or memberships.",
+    )
+    deleted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Set when the user is deleted; the row is purged in the background.",
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["phone_number"]
@@ -51,6 +64,10 @@ class AuthUser(AbstractUser):
 
     class Meta:
         db_table = "Users"
+        indexes = [
+            # Keyset pagination order (see users.pagination).
+            models.Index(fields=["-date_joined", "-id"], name="users_date_joined_id_idx")
+        ]
 
 
 class UserSettings(BaseModel):
@@ -175,11 +192,49 @@ class UserOrganization(BaseModel):
     class Meta:
         db_table = "UserOrganizations"
         unique_together = ("user", "tenant_id")
+        indexes = [
+            # Member directory order and tenant offboarding (see users.utils.tenants).
+            models.Index(
+                fields=["tenant_id", "created_at", "id"], name="members_tenant_joined_idx"
+            ),
+            # Incremental sync of the membership index (users.utils.tenants.index).
+            models.Index(fields=["updated_at"], name="members_updated_at_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.tenant_id}"
 
 
+class TenantMemberCount(BaseModel):
+    """
+    Number of ``UserOrganization`` rows per tenant, maintained on every
+    membership write so member counts never need a ``COUNT(*)``.
+    """
+
+    tenant_id = models.UUIDField(unique=True)
+    member_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "TenantMemberCounts"
+
+    def __str__(self):
+        return f"{self.tenant_id}: {self.member_count} members"
+
+
+class MembershipRemoval(BaseModel):
+    """
+    A ``UserOrganization`` that was deleted (or moved to another tenant),
+    kept for a while so the membership index can drop it incrementally.
+    """
+
+    tenant_id = models.UUIDField()
+    user_id = models.UUIDField()
+
+    class Meta(BaseModel.Meta):
+        db_table = "MembershipRemovals"
+        indexes = [models.Index(fields=["created_at"], name="removals_created_at_idx")]
+
+
 class UserAddress(BaseModel):
     user = models.ForeignKey(AuthUser, on_delete=models.CASCADE, related_name="address")
     address = models.UUIDField()
@@ -239,5 +294,109 @@ class UserSession(BaseModel):
         """Returns True if the session is expired, False otherwise."""
         return timezone.now() >= self.expires_at
 
+    class Meta(BaseModel.Meta):
+        constraints = [
+            # One session per device; the login upsert conflicts on this key.
+            models.UniqueConstraint(
+                fields=["user", "user_agent", "ip_address"],
+                name="unique_device_session",
+            ),
+            # NULLs are distinct in the key above; one session per device
+            # without a resolved IP address too.
+            models.UniqueConstraint(
+                fields=["user", "user_agent"],
+                condition=models.Q(ip_address__isnull=True),
+                name="unique_device_session_without_ip",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Session {self.session_id} for {self.user.username}"
+
+
+class RevokedToken(BaseModel):
+    """
+    A revoked JWT id, kept until the token would have expired anyway.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "RevokedTokens"
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"Revoked {self.jti} until {self.expires_at}"
+
+
+class LoginIdentifier(BaseModel):
+    """
+    A normalized email address or phone number a user can log in with.
+    Maintained from ``AuthUser`` by ``users.signals.sync_login_identifiers``.
+    """
+
+    EMAIL = "email"
+    PHONE = "phone"
+    KIND_CHOICES = [(EMAIL, "Email"), (PHONE, "Phone")]
+
+    user = models.ForeignKey(
+        AuthUser, on_delete=models.CASCADE, related_name="login_identifiers"
+    )
+    kind = models.CharField(max_length=5, choices=KIND_CHOICES)
+    value = models.CharField(
+        max_length=254,
+        unique=True,
+        help_text="Lowercase email address or E.164 phone number.",
+    )
+
+    class Meta:
+        db_table = "LoginIdentifiers"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "kind"], name="unique_identifier_kind")
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.value}"
+
+
+class UserDeletion(BaseModel):
+    """
+    A deleted user whose rows are being purged in the background, with the
+    number of rows removed so far per table.
+    """
+
+    user_id = models.UUIDField(unique=True)
+    requested_by = models.UUIDField(null=True, blank=True)
+    deleted_rows = models.JSONField(default=dict)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        db_table = "UserDeletions"
+
+    def __str__(self):
+        state = "purged" if self.completed_at else "pending"
+        return f"Deletion of {self.user_id} ({state})"
+
+
+class TenantOffboarding(BaseModel):
+    """
+    Removal of every membership of a tenant, processed in batches. The
+    counters record progress so far.
+    """
+
+    tenant_id = models.UUIDField(unique=True)
+    requested_by = models.UUIDField(null=True, blank=True)
+    removed_memberships = models.PositiveIntegerField(default=0)
+    orphaned_users = models.PositiveIntegerField(
+        default=0, help_text="Users left without any tenant, whose sessions were revoked."
+    )
+    revoked_sessions = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        db_table = "TenantOffboardings"
+
     def __str__(self):
-        return f"Session {self.session_id} for {self.user.username}"
\ No newline at end of file
+        state = "done" if self.completed_at else "pending"
+        return f"Offboarding of tenant {self.tenant_id} ({state})"
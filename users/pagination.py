@@ -0,0 +1,129 @@
+import base64
+import json
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over users ordered by ``(-date_joined, -id)``.
+
+    The cursor is an opaque encoding of the last row's ``(date_joined, id)``;
+    the next page starts right after it with a range condition on the composite
+    index, so a page costs the same however deep the client has paged. The id
+    breaks ties between users who joined at the same instant.
+
+    Subclasses page other tables by overriding ``position_field`` and
+    ``descending``.
+    """
+
+    position_field = "date_joined"
+    descending = True
+    page_size = settings.USER_PAGINATION["PAGE_SIZE"]
+    max_page_size = settings.USER_PAGINATION["MAX_PAGE_SIZE"]
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        # ``row`` is a model instance, or a values() dict on the fast path.
+        if isinstance(row, dict):
+            position, pk = row[self.position_field], row["id"]
+        else:
+            position, pk = getattr(row, self.position_field), row.pk
+        position = json.dumps([position.isoformat(), str(pk)])
+        return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            position, pk = json.loads(base64.urlsafe_b64decode(padded))
+            position, pk = parse_datetime(position), uuid.UUID(str(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        field, sign = self.position_field, "-" if self.descending else ""
+        queryset = queryset.order_by(f"{sign}{field}", f"{sign}id")
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            position, pk = cursor
+            after, bound = ("lt", "lte") if self.descending else ("gt", "gte")
+            # position <= ... bounds the index scan; the OR skips the ties
+            # already returned on the previous page.
+            queryset = queryset.filter(**{f"{field}__{bound}": position}).filter(
+                Q(**{f"{field}__{after}": position}) | Q(**{f"id__{after}": pk})
+            )
+
+        page = list(queryset[: size + 1])
+        self.has_next = len(page) > size
+        page = page[:size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class TenantMemberPagination(KeysetPagination):
+    """
+    Keyset pagination over a tenant's memberships, oldest first, along the
+    ``(tenant_id, created_at, id)`` index. The response carries the member
+    count passed to ``paginate_queryset``.
+    """
+
+    position_field = "created_at"
+    descending = False
+
+    def paginate_queryset(self, queryset, request, view=None, count=None):
+        self.count = count
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {"count": self.count, "next": self.get_next_link(), "results": data}
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {"type": "integer"}
+        return response_schema
@@ -1,14 +1,35 @@
+import uuid
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework import serializers
 from .utils.auth.token import generate_token_payload
+from .utils.auth.hashing import verify_password, hash_password
+from .utils.auth.login import find_login_user
+from .utils.auth.identifiers import (
+    normalize_email,
+    normalize_phone,
+    normalize_identifier,
+    identifier_taken,
+)
+from .utils.location.client import get_client_ip
+from .utils.search.users import CONTAINS, PREFIX, CONTAINS_MIN_LENGTH
 from .models import *
-import re
 
 User = get_user_model()
 
 
-class BaseUserSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Keep only the fields named in the optional ``fields`` argument."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BaseUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Base serializer containing shared user validation logic."""
 
     class Meta:
@@ -34,13 +55,10 @@ class BaseUserSerializer(serializers.ModelSerializer):
         if "phone_number" in data and not self.is_valid_phone(data["phone_number"]):
             errors["phone_number"] = "Invalid phone number format."
 
-        if User.objects.filter(email=data.get("email")).exists():
+        if identifier_taken(normalize_email(data.get("email"))):
             errors["email"] = "A user with this email already exists."
 
-        if (
-            data.get("phone_number")
-            and User.objects.filter(phone_number=data.get("phone_number")).exists()
-        ):
+        if identifier_taken(normalize_phone(data.get("phone_number"))):
             errors["phone_number"] = "A user with this phone number already exists."
 
         if errors:
@@ -51,9 +69,7 @@ class BaseUserSerializer(serializers.ModelSerializer):
     @staticmethod
     def is_valid_phone(phone_number):
         """Validate phone number format."""
-        import re
-
-        return re.match(r"^\+?1?\d{9,15}$", phone_number) is not None
+        return normalize_phone(phone_number) is not None
 
 
 class GetTokenPairSerializer(serializers.Serializer):
@@ -69,34 +85,138 @@ class GetTokenPairSerializer(serializers.Serializer):
         if not email_or_phone or not password:
             raise AuthenticationFailed("Email/Phone number and password are required.")
 
-        # Determine if input is email or phone number
-        if self.is_valid_email(email_or_phone):
-            user = User.objects.filter(email=email_or_phone).first()
-        elif self.is_valid_phone(email_or_phone):
-            user = User.objects.filter(phone_number=email_or_phone).first()
-        else:
+        identifier = normalize_identifier(email_or_phone)
+        if identifier is None:
             raise AuthenticationFailed("Invalid email or phone number format.")
 
-        if user is None or not user.check_password(password):
+        request = self.context.get("request")
+        ip_address = get_client_ip(request) if request else None
+        user, claims, ip_address_id = find_login_user(identifier, ip_address)
+
+        if user is None or not verify_password(user, password):
             raise AuthenticationFailed("Invalid credentials")
 
-        refresh = generate_token_payload(user)
+        refresh = generate_token_payload(user, claims)
 
         return {
             "refresh": str(refresh),
             "access": str(refresh.access_token),
             "user": user,
+            "ip_address": ip_address,
+            "ip_address_id": ip_address_id,
         }
 
-    @staticmethod
-    def is_valid_email(email):
-        """Validate email format."""
-        return re.match(r"[^@]+@[^@]+\.[^@]+", email) is not None
 
-    @staticmethod
-    def is_valid_phone(phone_number):
-        """Validate phone number format."""
-        return re.match(r"^\+?1?\d{9,15}$", phone_number) is not None
+class IntrospectionSerializer(serializers.Serializer):
+    tokens = serializers.ListField(
+        child=serializers.CharField(), required=False, default=list
+    )
+    session_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, default=list
+    )
+
+    def validate(self, attrs):
+        count = len(attrs["tokens"]) + len(attrs["session_ids"])
+        if not count:
+            raise serializers.ValidationError("Provide tokens or session_ids.")
+        if count > settings.INTROSPECTION_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"At most {settings.INTROSPECTION_MAX_ITEMS} items can be introspected at once."
+            )
+        return attrs
+
+
+class UserSearchSerializer(serializers.Serializer):
+    q = serializers.CharField()
+    mode = serializers.ChoiceField(choices=[CONTAINS, PREFIX], default=CONTAINS)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.USER_SEARCH["MAX_LIMIT"],
+        default=settings.USER_SEARCH["LIMIT"],
+    )
+
+    def validate(self, attrs):
+        if attrs["mode"] == CONTAINS and len(attrs["q"].strip()) < CONTAINS_MIN_LENGTH:
+            raise serializers.ValidationError(
+                {"q": f"Use at least {CONTAINS_MIN_LENGTH} characters, or mode=prefix."}
+            )
+        return attrs
+
+
+class BulkUserRowSerializer(serializers.Serializer):
+    """One row of a bulk provisioning request; uniqueness is checked per batch."""
+
+    email = serializers.EmailField()
+    phone_number = serializers.CharField(required=False, allow_blank=True, max_length=15)
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    password = serializers.CharField(required=False, allow_blank=True)
+
+    def validate_phone_number(self, value):
+        if value and normalize_phone(value) is None:
+            raise serializers.ValidationError("Invalid phone number format.")
+        return value
+
+
+class BulkProvisionSerializer(serializers.Serializer):
+    tenant_id = serializers.UUIDField()
+    users = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.BULK_PROVISIONING["MAX_USERS"],
+    )
+
+
+class MembershipCheckSerializer(serializers.Serializer):
+    pairs = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.MEMBERSHIP_INDEX["MAX_PAIRS"],
+    )
+
+    def validate_pairs(self, pairs):
+        # Parsed by hand: a nested serializer per pair dominates the cost of
+        # checking thousands of pairs against the in-memory index.
+        try:
+            return [
+                (uuid.UUID(str(pair["user_id"])), uuid.UUID(str(pair["tenant_id"])))
+                for pair in pairs
+            ]
+        except (KeyError, ValueError):
+            raise serializers.ValidationError(
+                "Each pair needs a valid user_id and tenant_id."
+            )
+
+
+class TenantMemberSerializer(serializers.Serializer):
+    """A membership row from ``tenant_members`` with its user's summary."""
+
+    user_id = serializers.UUIDField()
+    email = serializers.EmailField()
+    username = serializers.CharField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    role = serializers.UUIDField(allow_null=True)
+    joined_at = serializers.DateTimeField(source="created_at")
+
+
+class OffboardTenantSerializer(serializers.Serializer):
+    tenant_id = serializers.UUIDField()
+
+
+class TenantOffboardingSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TenantOffboarding
+        fields = [
+            "id",
+            "tenant_id",
+            "removed_memberships",
+            "orphaned_users",
+            "revoked_sessions",
+            "created_at",
+            "completed_at",
+        ]
+        read_only_fields = fields
 
 
 class UserCreationSerializer(BaseUserSerializer):
@@ -117,14 +237,16 @@ class UserCreationSerializer(BaseUserSerializer):
         password = validated_data["password"]
 
         # Check if a user already exists
-        user = (
-            User.objects.filter(email=email).first()
-            or User.objects.filter(phone_number=phone_number).first()
-        )
+        identifiers = [
+            value
+            for value in (normalize_email(email), normalize_phone(phone_number))
+            if value
+        ]
+        user = User.objects.filter(login_identifiers__value__in=identifiers).first()
 
         if user:
             # Authenticate user
-            if not user.check_password(password):
+            if not verify_password(user, password):
                 raise AuthenticationFailed("Email or Phone Number already in use")
 
             # Generate tokens for existing user
@@ -139,7 +261,7 @@ class UserCreationSerializer(BaseUserSerializer):
             username=email,
             email=email,
             phone_number=phone_number,
-            password=password,
+            password=hash_password(password),
             first_name=validated_data["first_name"],
             last_name=validated_data["last_name"],
         )
@@ -183,7 +305,7 @@ class UserSerializer(BaseUserSerializer):
         return UserSerializer(user).data
 
 
-class UserTenantSerializer(serializers.ModelSerializer):
+class UserTenantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserOrganization
         fields = "__all__"
@@ -201,7 +323,7 @@ class UserTenantSerializer(serializers.ModelSerializer):
         return user_org
 
 
-class UserSettingsSerializer(serializers.ModelSerializer):
+class UserSettingsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserSettings
         exclude = ["updated_at"]
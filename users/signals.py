@@ -1,9 +1,141 @@
-from django.db.models.signals import post_save
+import uuid
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import AuthUser, UserSettings
+from .models import AuthUser, UserSettings, UserOrganization
+from .utils.auth.principals import SNAPSHOT_FIELDS, bump_version
+from .utils.auth import claims
+from .utils.auth.identifiers import sync_identifiers
+from .utils.cache import etags
+from .utils.tenants.members import adjust_member_counts
+from .utils.tenants.index import record_removals
 
 
 @receiver(post_save, sender=AuthUser)
 def create_user_settings(sender, instance, created, **kwargs):
     if created:
         UserSettings.objects.get_or_create(user=instance)
+
+
+def invalidate_principal(user_id):
+    # Bump now and again once the write is visible to other connections, so a
+    # snapshot re-read from the uncommitted state cannot outlive the commit.
+    bump_version(user_id)
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+@receiver(post_save, sender=AuthUser)
+def invalidate_user_principal(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & set(SNAPSHOT_FIELDS):
+        return
+    invalidate_principal(instance.pk)
+
+
+@receiver(post_delete, sender=AuthUser)
+def delete_user_principal(sender, instance, **kwargs):
+    invalidate_principal(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=UserOrganization)
+def invalidate_membership_principal(sender, instance, **kwargs):
+    invalidate_principal(instance.user_id)
+
+
+@receiver(post_save, sender=AuthUser)
+def sync_login_identifiers(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & {"email", "phone_number"}:
+        return
+    sync_identifiers(instance)
+
+
+@receiver(pre_save, sender=AuthUser)
+def replace_data_version(sender, instance, update_fields=None, **kwargs):
+    # A full save writes the new version in the same UPDATE.
+    if update_fields is None:
+        instance.data_version = uuid.uuid4()
+
+
+@receiver(post_save, sender=AuthUser)
+def bump_user_data_version(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and "data_version" not in update_fields:
+        instance.data_version = etags.bump_versions([instance.pk])
+
+
+@receiver(post_save, sender=UserSettings)
+def bump_settings_data_version(sender, instance, created, **kwargs):
+    if not created:
+        etags.bump_versions([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=UserOrganization)
+def bump_membership_data_version(sender, instance, **kwargs):
+    etags.bump_versions([instance.user_id])
+
+
+def invalidate_claims(user_id):
+    # Like the principal: drop now and again after commit, so a document
+    # rebuilt from the uncommitted state cannot outlive the commit.
+    claims.drop_claims(user_id)
+    transaction.on_commit(lambda: claims.drop_claims(user_id))
+
+
+@receiver(post_save, sender=AuthUser)
+def invalidate_user_claims(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and not set(update_fields) & set(claims.USER_CLAIMS)):
+        return
+    invalidate_claims(instance.pk)
+
+
+@receiver(post_delete, sender=AuthUser)
+def drop_user_claims(sender, instance, **kwargs):
+    invalidate_claims(instance.pk)
+
+
+@receiver(post_save, sender=UserSettings)
+def invalidate_settings_claims(sender, instance, update_fields=None, **kwargs):
+    if update_fields and "language" not in update_fields:
+        return
+    invalidate_claims(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserOrganization)
+def invalidate_membership_claims(sender, instance, **kwargs):
+    invalidate_claims(instance.user_id)
+
+
+@receiver(pre_save, sender=UserOrganization)
+def remember_membership_tenant(sender, instance, **kwargs):
+    # An update may move the membership to another tenant; both counters change.
+    instance._previous_tenant_id = None
+    if not instance._state.adding:
+        instance._previous_tenant_id = (
+            UserOrganization.objects.filter(pk=instance.pk)
+            .values_list("tenant_id", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=UserOrganization)
+def count_saved_membership(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_tenant_id", None)
+    if created:
+        adjust_member_counts({instance.tenant_id: 1})
+    elif previous is not None and previous != instance.tenant_id:
+        adjust_member_counts({previous: -1, instance.tenant_id: 1})
+
+
+@receiver(post_delete, sender=UserOrganization)
+def count_deleted_membership(sender, instance, **kwargs):
+    adjust_member_counts({instance.tenant_id: -1})
+
+
+@receiver(post_save, sender=UserOrganization)
+def record_moved_membership(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_tenant_id", None)
+    if not created and previous is not None and previous != instance.tenant_id:
+        record_removals([(previous, instance.user_id)])
+
+
+@receiver(post_delete, sender=UserOrganization)
+def record_deleted_membership(sender, instance, **kwargs):
+    record_removals([(instance.tenant_id, instance.user_id)])
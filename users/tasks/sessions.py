@@ -1,10 +1,14 @@
 from celery import shared_task
 from django.utils.timezone import now
 from users.models import UserSession
+from users.utils.auth.sessions import invalidate_sessions
 
 
 @shared_task
 def clean_expired_sessions():
     """Delete all expired user sessions."""
     print("celery cleanup")
-    UserSession.objects.filter(expires_at__lt=now()).delete()
\ No newline at end of file
+    expired = UserSession.objects.filter(expires_at__lt=now())
+    session_ids = list(expired.values_list("session_id", flat=True))
+    expired.delete()
+    invalidate_sessions(session_ids)
\ No newline at end of file
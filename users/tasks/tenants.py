@@ -0,0 +1,8 @@
+from celery import shared_task
+from users.utils.accounts.offboarding import offboard_pending
+
+
+@shared_task
+def offboard_tenants():
+    """Run pending tenant offboardings batch by batch."""
+    offboard_pending()
\ No newline at end of file
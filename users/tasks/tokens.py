@@ -0,0 +1,9 @@
+from celery import shared_task
+from django.utils.timezone import now
+from users.models import RevokedToken
+
+
+@shared_task
+def clean_expired_revocations():
+    """Delete revocations of tokens that have expired on their own."""
+    RevokedToken.objects.filter(expires_at__lt=now()).delete()
\ No newline at end of file
@@ -0,0 +1,8 @@
+from celery import shared_task
+from users.utils.accounts.deletion import purge_pending
+
+
+@shared_task
+def purge_deleted_users():
+    """Purge the rows of deleted users in bounded batches."""
+    purge_pending()
\ No newline at end of file
@@ -2,6 +2,70 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.test import APIRequestFactory, force_authenticate
+from users.views import UserSettingsView, UserProfileView
+from users.authentication import CookieAuthentication, EmailOrPhoneBackend
+from users.models import (
+    UserSession,
+    UserOrganization,
+    UserSettings,
+    UserLocation,
+    UserDeletion,
+    TenantOffboarding,
+    TenantMemberCount,
+    IpAddress,
+    LoginIdentifier,
+)
+from users.utils.accounts.deletion import tombstone_user, purge_pending
+from users.utils.accounts.offboarding import offboard_tenant, request_offboarding
+from users.utils.tenants.members import member_count
+from users.utils.cache.etags import bump_versions
+from users.utils.tenants.index import membership_index
+from users.utils.tenants.client import TenantClient, TenantServiceError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from users.utils.provisioning.users import provision_users
+from users.utils.auth.sessions import session_cache, invalidate_sessions, get_session
+from users.utils.auth.principals import principal_cache, get_principal
+from users.utils.auth.keys import get_jwks, get_signing_keys, get_token_backend
+from users.utils.auth.tokens import RefreshToken
+from users.utils.auth.verifier import JWKSVerifier
+from users.utils.auth.hashing import HashingService, HashingUnavailable, verify_password
+from django.contrib.auth.hashers import make_password
+from users.utils.auth.login import LOGIN_QUERY_BUDGET, persist_login
+from users.utils.auth.claims import claims_cache, get_claims
+from users.utils.auth.token import generate_token_payload
+from users.utils.auth.refresh import refresh_results
+from users.utils.auth.revocation import RevocationStore, revocation_store
+from users.utils.search.users import similarity
+from users.utils.serialization.rows import get_row_mapper
+from users.serializers import UserSerializer, UserTenantSerializer, UserSettingsSerializer
+from rest_framework.renderers import JSONRenderer
+from users.utils.auth.throttle import (
+    SlidingWindowLimiter,
+    login_ip_limiter,
+    login_identifier_limiter,
+)
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import override_settings
+from concurrent.futures import Future
+from django.conf import settings
+from unittest import mock
+import base64
+import csv
+import io
+import json
+import jwt
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 
 
 User = get_user_model()
@@ -71,3 +135,1630 @@ class UserCreationTests(APITestCase):
         self.assertIn("email", response.data)
         self.assertIn("first_name", response.data)
         self.assertIn("last_name", response.data)
+
+
+class SessionCacheTests(APITestCase):
+    def setUp(self):
+        session_cache.clear()
+        self.user = User.objects.create_user(
+            username="cached@example.com",
+            email="cached@example.com",
+            phone_number="+1555000111",
+            password="password123",
+        )
+        self.session = UserSession.objects.create(
+            user=self.user,
+            refresh_token="refresh",
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+
+    def authenticate(self, session_id):
+        request = APIRequestFactory().get("/")
+        request.COOKIES["session_id"] = str(session_id)
+        CookieAuthentication().authenticate(request)
+        return request.user_session
+
+    def test_cached_session_skips_database(self):
+        """Test that a known session is only read from the database once."""
+        self.assertEqual(self.authenticate(self.session.session_id).user_id, str(self.user.id))
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(self.authenticate(self.session.session_id))
+
+    def test_invalidated_session_is_rejected(self):
+        """Test that deleting and invalidating a session takes effect immediately."""
+        self.authenticate(self.session.session_id)
+        self.session.delete()
+        invalidate_sessions([self.session.session_id])
+        self.assertIsNone(self.authenticate(self.session.session_id))
+
+
+class PrincipalCacheTests(APITestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(
+            username="principal@example.com",
+            email="principal@example.com",
+            phone_number="+1555000222",
+            password="password123",
+        )
+
+    def test_cached_principal_skips_database(self):
+        """Test that a cached principal is served without queries."""
+        self.assertEqual(get_principal(self.user.id).email, self.user.email)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_principal(self.user.id).pk, self.user.pk)
+        self.assertEqual(principal_cache.stats()["hits"], 1)
+
+    def test_deactivated_user_is_never_served(self):
+        """Test that saving the user bumps the version and drops the snapshot."""
+        get_principal(self.user.id)
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(get_principal(self.user.id).is_active)
+
+    def test_write_from_another_worker_expires_locally(self):
+        """Test that without a shared alias a snapshot lives at most LOCAL_TTL."""
+        local_ttl = settings.AUTH_CACHE["LOCAL_TTL"]
+        self.assertLessEqual(principal_cache.ttl, local_ttl)
+        get_principal(self.user.id)
+        # An update() runs no signals here, like a write made in another worker.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        later = time.monotonic() + local_ttl + 1
+        with mock.patch("users.utils.cache.ttl.time.monotonic", return_value=later):
+            self.assertFalse(get_principal(self.user.id).is_active)
+
+    def test_membership_change_refreshes_tenants(self):
+        """Test that adding a membership is reflected in the snapshot."""
+        self.assertEqual(get_principal(self.user.id).tenant_ids, [])
+        org = UserOrganization.objects.create(user=self.user, tenant_id=uuid.uuid4())
+        self.assertEqual(get_principal(self.user.id).tenant_ids, [str(org.tenant_id)])
+
+
+class SigningKeyTests(APITestCase):
+    def setUp(self):
+        self.keys_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            JWT_SIGNING={"KEYS_DIR": self.keys_dir, "JWKS_MAX_AGE": 300}
+        )
+        self.settings_override.enable()
+        call_command("generate_signing_key", algorithm="EdDSA", stdout=io.StringIO())
+        get_signing_keys.cache_clear()
+        get_token_backend.cache_clear()
+        self.user = User.objects.create_user(
+            username="signed@example.com",
+            email="signed@example.com",
+            phone_number="+1555000333",
+            password="password123",
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        get_signing_keys.cache_clear()
+        get_token_backend.cache_clear()
+        shutil.rmtree(self.keys_dir)
+
+    def test_tokens_are_signed_with_published_key(self):
+        """Test that minted tokens carry the kid of a key published in the JWKS."""
+        token = str(RefreshToken.for_user(self.user).access_token)
+        response = self.client.get(reverse("jwks"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("max-age=300", response["Cache-Control"])
+        header = jwt.get_unverified_header(token)
+        self.assertEqual(header["alg"], "EdDSA")
+        self.assertIn(header["kid"], [key["kid"] for key in response.json()["keys"]])
+
+    def test_verifier_validates_tokens_locally(self):
+        """Test that the peer verifier accepts our tokens using only the JWKS."""
+        token = str(RefreshToken.for_user(self.user).access_token)
+        jwks = mock.Mock(json=mock.Mock(return_value=get_jwks()))
+        with mock.patch("users.utils.auth.verifier.requests.get", return_value=jwks):
+            verifier = JWKSVerifier("http://testserver/api/auth/.well-known/jwks.json")
+            self.assertEqual(verifier.verify(token)["user_id"], str(self.user.id))
+            with self.assertRaises(jwt.InvalidTokenError):
+                verifier.verify(token[:-4] + "AAAA")
+
+
+@override_settings(SERVICE_TOKENS=["peer-service-token"])
+class IntrospectionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="introspect@example.com",
+            email="introspect@example.com",
+            phone_number="+1555000444",
+            password="password123",
+        )
+        self.session = UserSession.objects.create(
+            user=self.user,
+            refresh_token="refresh",
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        self.url = reverse("introspect")
+        self.client.credentials(HTTP_AUTHORIZATION="Service peer-service-token")
+
+    def test_introspection_requires_service_credential(self):
+        """Test that anonymous callers and wrong credentials get a 401."""
+        payload = {"session_ids": [str(self.session.session_id)]}
+        for header in ({}, {"HTTP_AUTHORIZATION": "Service wrong-token"}):
+            self.client.credentials(**header)
+            response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertNotIn("sessions", response.data)
+
+    def test_batch_introspection(self):
+        """Test that a batch is resolved with one query per table."""
+        token = str(RefreshToken.for_user(self.user).access_token)
+        payload = {
+            "tokens": [token, "not-a-token", token],
+            "session_ids": [str(self.session.session_id), str(uuid.uuid4())],
+        }
+        revocation_store.sync(force=True)
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["active"] for result in response.data["tokens"]], [True, False, True]
+        )
+        self.assertEqual(response.data["tokens"][0]["claims"]["user_id"], str(self.user.id))
+        self.assertEqual(
+            [result["active"] for result in response.data["sessions"]], [True, False]
+        )
+
+    def test_introspection_limit(self):
+        """Test that oversized batches are rejected."""
+        with override_settings(INTROSPECTION_MAX_ITEMS=1):
+            response = self.client.post(self.url, {"tokens": ["a", "b"]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PasswordHashingTests(APITestCase):
+    def test_login_rehashes_outdated_password(self):
+        """Test that a successful check upgrades the stored hash to the default hasher."""
+        user = User.objects.create(
+            username="rehash@example.com",
+            email="rehash@example.com",
+            password=make_password("password123", hasher="pbkdf2_sha1"),
+        )
+        self.assertTrue(verify_password(user, "password123"))
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+        self.assertFalse(verify_password(user, "wrong-password"))
+
+    def test_saturated_service_rejects_fast(self):
+        """Test that jobs beyond the queue depth are rejected with a 503."""
+        service = HashingService(workers=0, queue_depth=0, timeout=1)
+        service._slots.acquire()
+        with self.assertRaises(HashingUnavailable):
+            service.make_password("password123")
+        self.assertEqual(service.get_stats()["rejected"], 1)
+        service._slots.release()
+        self.assertTrue(service.make_password("password123"))
+
+    def test_bulk_hashing_uses_its_own_pool_in_chunks(self):
+        """Test that bulk hashing never takes login slots and runs chunk by chunk."""
+        service = HashingService(workers=0, queue_depth=0, timeout=1, chunk_size=3)
+        with mock.patch.object(service, "submit", wraps=service.submit) as submit:
+            encoded = service.make_passwords(f"password{i}" for i in range(10))
+        self.assertEqual(submit.call_count, 4)
+        self.assertEqual(len(encoded), 10)
+
+        with mock.patch(
+            "users.utils.auth.hashing.hashing_service.submit",
+            side_effect=HashingUnavailable(),
+        ):
+            row = {"email": "pooled@example.com", "first_name": "", "last_name": ""}
+            results = provision_users([{**row, "password": "password123"}])
+        self.assertEqual(results[0]["status"], "created")
+
+    def test_slow_hash_is_reported_as_unavailable(self):
+        """Test that a job outliving the timeout becomes a 503, not a failed login."""
+        service = HashingService(workers=0, queue_depth=1, timeout=0.01)
+        with mock.patch.object(service, "submit", return_value=Future()):
+            with self.assertRaises(HashingUnavailable):
+                service.check_password("password123", make_password("password123"))
+
+        user = User.objects.create(
+            username="slowhash@example.com",
+            email="slowhash@example.com",
+            password=make_password("password123"),
+        )
+        with mock.patch(
+            "users.utils.auth.hashing.hashing_service.check_password",
+            side_effect=HashingUnavailable(),
+        ):
+            response = self.client.post(
+                reverse("login"),
+                {"email_or_phone": user.email, "password": "password123"},
+            )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class LoginPipelineTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            username="login@example.com",
+            email="login@example.com",
+            phone_number="+1555000555",
+            password=make_password("password123"),
+        )
+        self.tenant_id = uuid.uuid4()
+        UserOrganization.objects.create(user=self.user, tenant_id=self.tenant_id)
+        self.url = reverse("login")
+        self.credentials = {"email_or_phone": self.user.email, "password": "password123"}
+
+    def login(self):
+        return self.client.post(self.url, self.credentials, HTTP_USER_AGENT="tests")
+
+    def test_login_stays_within_query_budget(self):
+        """Test that a repeat login from a known device fits the query budget."""
+        self.login()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        statements = [q["sql"] for q in queries]
+        self.assertLessEqual(len(statements), LOGIN_QUERY_BUDGET, statements)
+
+    def test_login_reuses_device_session(self):
+        """Test that logging in twice from one device keeps a single session."""
+        self.login()
+        response = self.login()
+        session = UserSession.objects.get(user=self.user)
+        self.assertEqual(response.cookies["session_id"].value, str(session.session_id))
+        claims = RefreshToken(session.refresh_token).payload
+        self.assertEqual(claims["tenants"], [str(self.tenant_id)])
+        self.assertEqual(claims["language"], "en")
+
+    def test_relogin_keeps_session_without_ip(self):
+        """Test that a device without a known IP keeps one session across logins."""
+        first = persist_login(self.user, RefreshToken.for_user(self.user), None, None, "tests")
+        self.assertIsNotNone(get_session(first.session_id))
+        refresh = RefreshToken.for_user(self.user)
+        second = persist_login(self.user, refresh, None, None, "tests")
+        session = UserSession.objects.get(user=self.user)
+        self.assertEqual(first.session_id, second.session_id)
+        self.assertEqual(session.pk, second.pk)
+        self.assertEqual(session.refresh_token, str(refresh))
+        self.assertIsNotNone(get_session(second.session_id))
+
+    def test_login_rejects_invalid_credentials(self):
+        """Test that a wrong password is rejected without creating a session."""
+        self.credentials["password"] = "wrong-password"
+        response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+
+
+class TokenClaimsTests(APITestCase):
+    def setUp(self):
+        claims_cache.clear()
+        self.user = User.objects.create_user(
+            username="claims@example.com",
+            email="claims@example.com",
+            phone_number="+1555000666",
+            password="password123",
+        )
+
+    def test_minting_reads_only_cached_claims(self):
+        """Test that a token is minted without queries once the claims are cached."""
+        generate_token_payload(self.user)
+        with self.assertNumQueries(0):
+            refresh = generate_token_payload(self.user)
+        self.assertEqual(refresh["language"], "en")
+        self.assertEqual(refresh["tenants"], [])
+
+    def test_claims_follow_settings_and_memberships(self):
+        """Test that the cached document is rebuilt when its sources change."""
+        get_claims(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            user_settings = UserSettings.objects.get(user=self.user)
+            user_settings.language = "fr"
+            user_settings.save()
+            org = UserOrganization.objects.create(user=self.user, tenant_id=uuid.uuid4())
+        with self.assertNumQueries(1):
+            claims = get_claims(self.user.pk)
+        self.assertEqual(claims["language"], "fr")
+        self.assertEqual(claims["tenants"], [str(org.tenant_id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            org.delete()
+        self.assertEqual(get_claims(self.user.pk)["tenants"], [])
+
+    def test_claims_expire_locally_without_shared_alias(self):
+        """Test that without a shared alias a document lives at most LOCAL_TTL."""
+        self.assertLessEqual(claims_cache.ttl, settings.AUTH_CACHE["LOCAL_TTL"])
+        get_claims(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+        later = time.monotonic() + settings.AUTH_CACHE["LOCAL_TTL"] + 1
+        with mock.patch("users.utils.cache.ttl.time.monotonic", return_value=later):
+            self.assertTrue(get_claims(self.user.pk)["is_superuser"])
+
+
+class RefreshCoalescingTests(APITestCase):
+    def setUp(self):
+        refresh_results.clear()
+        self.user = User.objects.create_user(
+            username="refresh@example.com",
+            email="refresh@example.com",
+            phone_number="+1555000777",
+            password="password123",
+        )
+        self.refresh = str(generate_token_payload(self.user))
+        self.session = UserSession.objects.create(
+            user=self.user,
+            refresh_token=self.refresh,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        self.url = reverse("token_refresh")
+        self.client.cookies["session_id"] = str(self.session.session_id)
+
+    def test_concurrent_web_refreshes_share_one_result(self):
+        """Test that refreshes within the window reuse the first result."""
+        first = self.client.post(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.post(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["access"], second.data["access"])
+
+    def test_rotated_mobile_token_stays_valid_during_grace(self):
+        """Test that a racing mobile client presenting the old token gets the rotated one."""
+        first = self.client.post(
+            self.url, {"refresh": self.refresh}, HTTP_USER_AGENT="iPhone"
+        )
+        second = self.client.post(
+            self.url, {"refresh": self.refresh}, HTTP_USER_AGENT="iPhone"
+        )
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(first.data["refresh"], self.refresh)
+        self.assertEqual(first.data["refresh"], second.data["refresh"])
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.refresh_token, first.data["refresh"])
+
+    def test_grace_period_outlasts_local_ttl(self):
+        """Test that the rotated result is kept for GRACE_PERIOD, not LOCAL_TTL."""
+        first = self.client.post(
+            self.url, {"refresh": self.refresh}, HTTP_USER_AGENT="iPhone"
+        )
+        later = time.monotonic() + settings.AUTH_CACHE["LOCAL_TTL"] + 1
+        self.assertLess(later, time.monotonic() + settings.TOKEN_REFRESH["GRACE_PERIOD"])
+        with mock.patch("users.utils.cache.ttl.time.monotonic", return_value=later):
+            second = self.client.post(
+                self.url, {"refresh": self.refresh}, HTTP_USER_AGENT="iPhone"
+            )
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data["refresh"], second.data["refresh"])
+
+    def test_logout_drops_recent_refresh_result(self):
+        """Test that a refresh right after logout is not answered from the window."""
+        first = self.client.post(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        self.client.cookies["refreshToken"] = self.refresh
+        response = self.client.post(
+            reverse("logout"), HTTP_AUTHORIZATION=f"Bearer {first.data['access']}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+
+        self.client.cookies["session_id"] = str(self.session.session_id)
+        response = self.client.post(self.url)
+        self.assertNotEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TokenRevocationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="revoke@example.com",
+            email="revoke@example.com",
+            phone_number="+1555000888",
+            password="password123",
+        )
+        self.store = RevocationStore(capacity=100, error_rate=0.01, sync_interval=60)
+
+    def test_revoked_jti_is_shared_through_sync(self):
+        """Test that a revocation reaches another worker's store on sync."""
+        exp = time.time() + 60
+        self.store.revoke("revoked-jti", exp)
+        self.assertTrue(self.store.is_revoked("revoked-jti"))
+        self.assertFalse(self.store.is_revoked("live-jti"))
+
+        other_worker = RevocationStore(capacity=100, error_rate=0.01, sync_interval=60)
+        other_worker.sync(force=True)
+        self.assertTrue(other_worker.is_revoked("revoked-jti"))
+
+    def test_expired_entries_are_dropped(self):
+        """Test that entries are only held until the token's own expiry."""
+        self.store.revoke("short-lived", time.time() + 0.05)
+        time.sleep(0.1)
+        self.store.sweep()
+        self.assertEqual(len(self.store), 0)
+        self.assertFalse(self.store.is_revoked("short-lived"))
+
+    def test_logout_revokes_tokens(self):
+        """Test that tokens used for logout no longer authenticate."""
+        refresh = generate_token_payload(self.user)
+        access = str(refresh.access_token)
+        self.client.cookies["refreshToken"] = str(refresh)
+        response = self.client.post(
+            reverse("logout"), HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_205_RESET_CONTENT)
+        response = self.client.post(
+            reverse("logout"), HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_logout_all_invalidates_outstanding_tokens(self):
+        """Test that logging out everywhere rejects every previously issued token."""
+        first = str(generate_token_payload(self.user).access_token)
+        second = str(generate_token_payload(self.user).access_token)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("logout_session"), HTTP_AUTHORIZATION=f"Bearer {first}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(
+            reverse("logout_session"), HTTP_AUTHORIZATION=f"Bearer {second}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        fresh = generate_token_payload(User.objects.get(pk=self.user.pk)).access_token
+        self.assertEqual(fresh["token_epoch"], 1)
+        response = self.client.post(
+            reverse("logout_session"), HTTP_AUTHORIZATION=f"Bearer {fresh}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class LoginIdentifierTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="Mixed.Case@Example.com",
+            email="Mixed.Case@Example.com",
+            phone_number="9377230086",
+            password="password123",
+        )
+        self.url = reverse("login")
+
+    def login(self, email_or_phone):
+        return self.client.post(
+            self.url,
+            {"email_or_phone": email_or_phone, "password": "password123"},
+            HTTP_USER_AGENT="tests",
+        )
+
+    def test_identifiers_are_normalized(self):
+        """Test that identifiers are stored as lowercase email and E.164 phone."""
+        self.assertEqual(
+            dict(self.user.login_identifiers.values_list("kind", "value")),
+            {"email": "mixed.case@example.com", "phone": "+19377230086"},
+        )
+        self.user.phone_number = "+1 (937) 555-0100"
+        self.user.save()
+        self.assertTrue(
+            self.user.login_identifiers.filter(value="+19375550100").exists()
+        )
+        self.assertEqual(self.user.login_identifiers.count(), 2)
+
+    def test_login_with_any_notation(self):
+        """Test that any notation of the email or phone number logs in."""
+        for email_or_phone in (
+            "MIXED.case@example.COM",
+            "+19377230086",
+            "(937) 723-0086",
+            "937.723.0086",
+        ):
+            with self.subTest(email_or_phone=email_or_phone):
+                response = self.login(email_or_phone)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_lookup_is_a_single_equality_query(self):
+        """Test that the user is resolved with one query on the identifier index."""
+        backend = EmailOrPhoneBackend()
+        with CaptureQueriesContext(connection) as queries:
+            user = backend.authenticate(
+                None, email_or_phone="937-723-0086", password="password123"
+            )
+        self.assertEqual(user, self.user)
+        self.assertIn('"LoginIdentifiers"."value" =', queries[0]["sql"])
+        self.assertNotIn(" OR ", queries[0]["sql"])
+
+
+class LoginThrottleTests(APITestCase):
+    def setUp(self):
+        login_ip_limiter.clear()
+        login_identifier_limiter.clear()
+        self.user = User.objects.create_user(
+            username="throttle@example.com",
+            email="throttle@example.com",
+            phone_number="+1555000999",
+            password="password123",
+        )
+        self.url = reverse("login")
+
+    def tearDown(self):
+        login_ip_limiter.clear()
+        login_identifier_limiter.clear()
+
+    def login(self, password):
+        return self.client.post(
+            self.url,
+            {"email_or_phone": "Throttle@example.com", "password": password},
+            HTTP_USER_AGENT="tests",
+        )
+
+    def test_rejects_before_hashing(self):
+        """Test that attempts over the identifier budget never reach the hasher."""
+        limit = login_identifier_limiter.limit
+        for _ in range(limit):
+            self.assertEqual(self.login("wrong").status_code, status.HTTP_400_BAD_REQUEST)
+
+        with mock.patch("users.serializers.verify_password") as verify:
+            response = self.login("password123")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        verify.assert_not_called()
+
+    def test_success_restores_identifier_budget(self):
+        """Test that a successful login resets the identifier's failures."""
+        for _ in range(login_identifier_limiter.limit - 1):
+            self.login("wrong")
+        self.assertEqual(self.login("password123").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login("wrong").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sliding_window(self):
+        """Test that the previous window's attempts count in proportion to overlap."""
+        limiter = SlidingWindowLimiter("test", limit=4, window=60)
+        with mock.patch("users.utils.auth.throttle.time.time", return_value=600.0):
+            for _ in range(4):
+                self.assertTrue(limiter.hit("203.0.113.7")[0])
+            self.assertEqual(limiter.hit("203.0.113.7"), (False, 60))
+            self.assertTrue(limiter.hit("203.0.113.8")[0])
+        # Half of the previous window still overlaps: 4 * 0.5 = 2 attempts left.
+        with mock.patch("users.utils.auth.throttle.time.time", return_value=690.0):
+            self.assertTrue(limiter.hit("203.0.113.7")[0])
+            self.assertTrue(limiter.hit("203.0.113.7")[0])
+            self.assertFalse(limiter.hit("203.0.113.7")[0])
+
+
+class UserPaginationTests(APITestCase):
+    def setUp(self):
+        joined = timezone.now()
+        self.users = [
+            User.objects.create_user(
+                username=f"page{i}@example.com",
+                email=f"page{i}@example.com",
+                phone_number=f"+1555100{i:04d}",
+                password="password123",
+                # Pairs of users share a join time to exercise the id tie-break.
+                date_joined=joined - timedelta(minutes=i // 2),
+            )
+            for i in range(7)
+        ]
+        self.client.force_authenticate(self.users[0])
+
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(user["id"] for user in response.data["results"])
+            url = response.data["next"]
+        return seen
+
+    def test_pages_cover_every_user_once_in_order(self):
+        """Test that following cursors returns each user once in keyset order."""
+        seen = self.walk(reverse("service-list") + "?page_size=2")
+        expected = [
+            str(user.pk)
+            for user in sorted(
+                self.users, key=lambda u: (u.date_joined, u.pk), reverse=True
+            )
+        ]
+        self.assertEqual(seen, expected)
+
+    def test_filter_is_paginated(self):
+        """Test that filtered listings are paginated the same way."""
+        seen = self.walk(reverse("service-filter-users") + "?email=page&page_size=3")
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_deep_page_does_not_offset(self):
+        """Test that a later page is fetched with a keyset condition, not OFFSET."""
+        response = self.client.get(reverse("service-list") + "?page_size=3")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data["next"])
+        sql = " ".join(q["sql"] for q in queries)
+        self.assertNotIn("OFFSET", sql)
+        self.assertIn("LIMIT 4", sql)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        response = self.client.get(reverse("service-list") + "?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_id(self):
+        """Test that a cursor whose id is not a UUID is rejected, not a 500."""
+        position = json.dumps([timezone.now().isoformat(), "not-a-uuid"])
+        cursor = base64.urlsafe_b64encode(position.encode()).decode()
+        response = self.client.get(reverse("service-list"), {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class UserSearchTests(APITestCase):
+    def setUp(self):
+        people = [
+            ("ada.lovelace@example.com", "Ada", "Lovelace"),
+            ("adam.smith@example.com", "Adam", "Smith"),
+            ("grace.hopper@example.com", "Grace", "Hopper"),
+        ]
+        self.users = [
+            User.objects.create_user(
+                username=email,
+                email=email,
+                phone_number=f"+1555200{i:04d}",
+                password="password123",
+                first_name=first_name,
+                last_name=last_name,
+            )
+            for i, (email, first_name, last_name) in enumerate(people)
+        ]
+        self.client.force_authenticate(self.users[0])
+        self.url = reverse("service-search")
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [row["email"] for row in response.data["results"]]
+
+    def test_substring_search_is_ranked(self):
+        """Test that substring matches come back best match first."""
+        self.assertEqual(
+            self.search(q="lovelace"),
+            ["ada.lovelace@example.com"],
+        )
+        results = self.search(q="Ada Lovelace")
+        self.assertEqual(results, ["ada.lovelace@example.com"])
+        self.assertEqual(
+            self.search(q="ada"), ["ada.lovelace@example.com", "adam.smith@example.com"]
+        )
+
+    def test_prefix_mode_and_limit(self):
+        """Test prefix autocomplete and the result limit."""
+        self.assertEqual(len(self.search(q="a", mode="prefix")), 2)
+        self.assertEqual(len(self.search(q="a", mode="prefix", limit=1)), 1)
+        self.assertEqual(self.search(q="hop", mode="prefix"), [])
+
+    def test_short_substring_is_rejected(self):
+        """Test that substrings too short for the trigram index are rejected."""
+        response = self.client.get(self.url, {"q": "ad"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similarity_matches_pg_trgm(self):
+        """Test that the Python fallback scores like pg_trgm's similarity()."""
+        self.assertAlmostEqual(similarity("word", "two words"), 4 / 11)
+
+
+class UserExportTests(APITestCase):
+    def setUp(self):
+        self.tenant_id = uuid.uuid4()
+        self.users = [
+            User.objects.create_user(
+                username=f"export{i}@example.com",
+                email=f"export{i}@example.com",
+                phone_number=f"+1555300{i:04d}",
+                password="password123",
+            )
+            for i in range(3)
+        ]
+        UserOrganization.objects.create(user=self.users[1], tenant_id=self.tenant_id)
+        self.client.force_authenticate(self.users[0])
+        self.url = reverse("service-export")
+
+    def test_ndjson_export_streams_every_user(self):
+        """Test that the NDJSON export streams one JSON object per user."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            sorted(row["email"] for row in rows), [user.email for user in self.users]
+        )
+
+    def test_csv_export_filters_by_tenant(self):
+        """Test that the CSV export can be limited to a tenant's members."""
+        response = self.client.get(
+            self.url, {"output": "csv", "tenant_id": str(self.tenant_id)}
+        )
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row["email"] for row in rows], ["export1@example.com"])
+
+    def test_export_command(self):
+        """Test that the management command writes the same rows."""
+        out = io.StringIO()
+        call_command("export_users", "--format", "ndjson", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+    def test_export_command_rejects_invalid_tenant(self):
+        """Test that a malformed --tenant is reported instead of crashing."""
+        with self.assertRaises(CommandError):
+            call_command("export_users", "--tenant", "not-a-uuid", stdout=io.StringIO())
+
+
+class BulkProvisioningTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="bulkadmin@example.com",
+            email="bulkadmin@example.com",
+            phone_number="+1555400000",
+            password="password123",
+        )
+        self.tenant_id = uuid.uuid4()
+        UserOrganization.objects.create(user=self.admin, tenant_id=self.tenant_id)
+        self.client.force_authenticate(self.admin)
+        self.url = reverse("service-bulk-provision")
+
+    def row(self, i, **extra):
+        return {
+            "email": f"bulk{i}@example.com",
+            "first_name": "Bulk",
+            "last_name": f"User{i}",
+            **extra,
+        }
+
+    def test_creates_users_with_settings_and_memberships(self):
+        """Test that valid rows are created in a fixed number of queries."""
+        rows = [self.row(i) for i in range(50)]
+        rows[0]["password"] = "password123"
+        rows[1]["phone_number"] = "(937) 555-0142"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url, {"tenant_id": str(self.tenant_id), "users": rows}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(response.data["created"], 50)
+        self.assertLess(len(queries), 15)
+
+        user = User.objects.get(email="bulk0@example.com")
+        self.assertTrue(verify_password(user, "password123"))
+        self.assertFalse(User.objects.get(email="bulk2@example.com").has_usable_password())
+        self.assertEqual(UserSettings.objects.count(), 51)
+        self.assertEqual(UserOrganization.objects.filter(tenant_id=self.tenant_id).count(), 51)
+        self.assertTrue(
+            User.objects.filter(login_identifiers__value="+19375550142").exists()
+        )
+
+    def test_reports_errors_per_row(self):
+        """Test that invalid, taken and repeated rows fail without blocking the rest."""
+        rows = [
+            self.row(0),
+            self.row(1, email="not-an-email"),
+            self.row(2, email="BulkAdmin@example.com"),
+            self.row(3, email="bulk0@example.com"),
+        ]
+        response = self.client.post(
+            self.url, {"tenant_id": str(self.tenant_id), "users": rows}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "error", "error", "error"],
+        )
+        self.assertEqual(
+            [result["index"] for result in response.data["results"]], [0, 1, 2, 3]
+        )
+
+    def test_legacy_user_without_identifiers_is_reported_per_row(self):
+        """Test that a raw email taken by a user without identifiers fails only its row."""
+        legacy = User.objects.create_user(
+            username="legacy@example.com",
+            email="legacy@example.com",
+            phone_number="+1555400001",
+            password="password123",
+        )
+        LoginIdentifier.objects.filter(user=legacy).delete()
+        rows = [self.row(0), self.row(1, email="legacy@example.com"), self.row(2)]
+        response = self.client.post(
+            self.url, {"tenant_id": str(self.tenant_id), "users": rows}, format="json"
+        )
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "error", "created"],
+        )
+        self.assertIn("email", response.data["results"][1]["errors"])
+
+    def test_concurrent_conflict_fails_only_its_row(self):
+        """Test that a unique violation at insert time is retried row by row."""
+        User.objects.create_user(
+            username="bulk1@example.com",
+            email="bulk1@example.com",
+            phone_number="+1555400002",
+            password="password123",
+        )
+        rows = [self.row(i) for i in range(3)]
+        with mock.patch("users.utils.provisioning.users._taken_rows", return_value={}):
+            results = provision_users(rows, self.tenant_id)
+        self.assertEqual(
+            [result["status"] for result in results], ["created", "error", "created"]
+        )
+        self.assertTrue(User.objects.filter(email="bulk2@example.com").exists())
+
+    def test_requires_tenant_membership(self):
+        """Test that callers can only provision into their own tenants."""
+        response = self.client.post(
+            self.url, {"tenant_id": str(uuid.uuid4()), "users": [self.row(0)]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ImportUsersTests(APITestCase):
+    def setUp(self):
+        self.existing = User.objects.create_user(
+            username="taken@example.com",
+            email="taken@example.com",
+            phone_number="+1555500000",
+            password="password123",
+        )
+        self.tenant_id = uuid.uuid4()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = f"{self.directory}/users.csv"
+        with open(self.path, "w", newline="") as source:
+            writer = csv.writer(source)
+            writer.writerow(["email", "phone_number", "first_name", "last_name", "password"])
+            writer.writerow(["one@example.com", "937-555-0101", "One", "User", "secret-1"])
+            writer.writerow(["TAKEN@example.com", "", "Taken", "User", ""])
+            writer.writerow(["", "", "No", "Email", ""])
+            writer.writerow(["two@example.com", "", "Two", "User", ""])
+            writer.writerow(["three@example.com", "", "Three", "User", ""])
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command(
+            "import_users", self.path, "--tenant", str(self.tenant_id), *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_imports_users_with_settings_identifiers_and_memberships(self):
+        """Test that new rows are merged and taken or invalid rows are counted."""
+        output = self.run_import("--batch-size", "2")
+        self.assertIn("3 created, 1 already present, 1 invalid", output)
+
+        user = User.objects.get(email="one@example.com")
+        self.assertTrue(verify_password(user, "secret-1"))
+        self.assertTrue(UserSettings.objects.filter(user=user).exists())
+        self.assertTrue(user.login_identifiers.filter(value="+19375550101").exists())
+        self.assertEqual(UserOrganization.objects.filter(tenant_id=self.tenant_id).count(), 3)
+        self.assertFalse(User.objects.get(email="two@example.com").has_usable_password())
+
+    def test_resumes_from_checkpoint(self):
+        """Test that a rerun continues after the rows already imported."""
+        with open(f"{self.path}.checkpoint", "w") as checkpoint:
+            json.dump({"rows": 3, "created": 1, "skipped": 1, "invalid": 1}, checkpoint)
+        output = self.run_import()
+        self.assertIn("Resuming after row 3.", output)
+        self.assertFalse(User.objects.filter(email="one@example.com").exists())
+        self.assertTrue(User.objects.filter(email="three@example.com").exists())
+
+        output = self.run_import()
+        self.assertIn("Resuming after row 5.", output)
+        self.assertEqual(User.objects.filter(email="three@example.com").count(), 1)
+
+    def test_ndjson_rows_with_non_string_values_are_invalid(self):
+        """Test that NDJSON rows with numbers, lists or non-objects are counted, not fatal."""
+        self.path = f"{self.directory}/users.ndjson"
+        rows = [
+            {"email": "four@example.com", "first_name": "Four"},
+            {"email": "five@example.com", "phone_number": 5550101},
+            {"email": ["six@example.com"]},
+            ["seven@example.com"],
+            "eight@example.com",
+        ]
+        with open(self.path, "w") as source:
+            source.writelines(json.dumps(row) + "\n" for row in rows)
+
+        output = self.run_import()
+        self.assertIn("1 created, 0 already present, 4 invalid", output)
+        self.assertTrue(User.objects.filter(email="four@example.com").exists())
+
+    def test_malformed_ndjson_line_is_invalid(self):
+        """Test that a line that is not JSON is counted and the import goes on."""
+        self.path = f"{self.directory}/users.ndjson"
+        with open(self.path, "w") as source:
+            source.write(json.dumps({"email": "nine@example.com"}) + "\n")
+            source.write('{"email": "broken@example.com"\n')
+            source.write(json.dumps({"email": "ten@example.com"}) + "\n")
+
+        output = self.run_import("--batch-size", "1")
+        self.assertIn("2 created, 0 already present, 1 invalid", output)
+        self.assertTrue(User.objects.filter(email="ten@example.com").exists())
+        with open(f"{self.path}.checkpoint") as checkpoint:
+            self.assertEqual(json.load(checkpoint)["rows"], 3)
+
+    def test_invalid_tenant_is_rejected(self):
+        """Test that a malformed --tenant stops the import before any row is read."""
+        with self.assertRaises(CommandError):
+            call_command(
+                "import_users", self.path, "--tenant", "not-a-uuid", stdout=io.StringIO()
+            )
+        self.assertFalse(User.objects.filter(email="one@example.com").exists())
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="sparse@example.com",
+            email="sparse@example.com",
+            phone_number="+1555600000",
+            password="password123",
+            first_name="Sparse",
+        )
+        UserOrganization.objects.create(user=self.user, tenant_id=uuid.uuid4())
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return response, [q["sql"] for q in queries]
+
+    def test_user_fields_prune_payload_and_columns(self):
+        """Test that ?fields= narrows both the response and the SELECT."""
+        response, queries = self.get(reverse("service-list"), fields="id,email")
+        self.assertEqual(set(response.data["results"][0]), {"id", "email"})
+        select = next(sql for sql in queries if 'FROM "Users"' in sql)
+        self.assertNotIn('"first_name"', select)
+        self.assertNotIn('"password"', select)
+
+    def test_exclude(self):
+        """Test that ?exclude= drops fields from the default set."""
+        response, _ = self.get(reverse("service-list"), exclude="phone_number,last_name")
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "email", "first_name"}
+        )
+
+    def test_settings_and_tenants(self):
+        """Test the same contract on the settings and tenant views."""
+        # UserSettingsView is not routed at the moment.
+        request = APIRequestFactory().get("/", {"fields": "language"})
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = UserSettingsView.as_view()(request)
+        self.assertEqual(response.data, {"language": "en"})
+        self.assertNotIn('"bank_account_number"', queries[-1]["sql"])
+
+        response, _ = self.get(reverse("tenant-list"), fields="tenant_id")
+        self.assertEqual([set(row) for row in response.data], [{"tenant_id"}])
+
+    def test_field_spellings_share_one_row_mapper(self):
+        """Test that order and duplicates in ?fields= do not grow the mapper cache."""
+        get_row_mapper.cache_clear()
+        for fields in ("id,email", "email,id", "email,id,email,id"):
+            response, _ = self.get(reverse("service-list"), fields=fields)
+            self.assertEqual(list(response.data["results"][0]), ["id", "email"])
+        self.assertEqual(get_row_mapper.cache_info().currsize, 1)
+        self.assertIsNotNone(get_row_mapper.cache_info().maxsize)
+
+    def test_unknown_field_is_rejected(self):
+        """Test that unknown or write-only field names are a 400."""
+        for params in ({"fields": "id,nope"}, {"fields": "password"}, {"exclude": "nope"}):
+            response = self.client.get(reverse("service-list"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastListConformanceTests(APITestCase):
+    """The values() fast path must render byte-identical responses."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"fast{i}@example.com",
+                email=f"fast{i}@example.com",
+                phone_number=f"+1555700{i:04d}" if i % 2 else None,
+                password="password123",
+                first_name=f"Fäst {i}",
+                last_name="" if i % 3 else "Ünïcode",
+            )
+            for i in range(5)
+        ]
+        for role in (uuid.uuid4(), uuid.uuid4(), None):
+            UserOrganization.objects.create(
+                user=self.users[0], tenant_id=uuid.uuid4(), role=role
+            )
+        self.client.force_authenticate(self.users[0])
+
+    def assertConforms(self, url, params=None):
+        fast = self.client.get(url, params)
+        with mock.patch("users.fieldsets.FastListMixin.get_row_mapper", return_value=None):
+            slow = self.client.get(url, params)
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_user_list(self):
+        """Test UserViewSet.list, paginated and with sparse fields."""
+        self.assertConforms(reverse("service-list"))
+        self.assertConforms(reverse("service-list"), {"page_size": 2})
+        self.assertConforms(reverse("service-list"), {"fields": "email,id"})
+
+    def test_filter_users(self):
+        """Test filter_users with and without sparse fields."""
+        self.assertConforms(reverse("service-filter-users"), {"email": "fast"})
+        self.assertConforms(
+            reverse("service-filter-users"), {"email": "fast", "exclude": "first_name"}
+        )
+
+    def test_tenant_list(self):
+        """Test UserTenantView.list with and without sparse fields."""
+        self.assertConforms(reverse("tenant-list"))
+        self.assertConforms(reverse("tenant-list"), {"fields": "tenant_id,role,user"})
+
+    def test_mapper_matches_serializers_field_by_field(self):
+        """Test every supported serializer against its mapper on stored rows."""
+        renderer = JSONRenderer()
+        cases = [
+            (UserSerializer, User.objects.all()),
+            (UserTenantSerializer, UserOrganization.objects.all()),
+            (UserSettingsSerializer, UserSettings.objects.all()),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                mapper = get_row_mapper(serializer_class)
+                self.assertIsNotNone(mapper)
+                self.assertEqual(
+                    renderer.render([mapper(row) for row in queryset.values(*mapper.columns)]),
+                    renderer.render(serializer_class(queryset, many=True).data),
+                )
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="etag@example.com",
+            email="etag@example.com",
+            phone_number="+1555800000",
+            password="password123",
+            first_name="Etag",
+        )
+        self.factory = APIRequestFactory()
+
+    def call(self, view, method="get", data=None, **headers):
+        request = getattr(self.factory, method)("/", data, format="json", **headers)
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request)
+
+    def test_settings_not_modified_without_loading_the_row(self):
+        """Test that a matching If-None-Match is answered from the validators alone."""
+        response = self.call(UserSettingsView)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.call(UserSettingsView, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"bank_account_number"', queries[0]["sql"])
+
+    def test_sparse_representation_has_its_own_etag(self):
+        """Test that ?fields= selects a different ETag than the full document."""
+        etag = self.call(UserSettingsView)["ETag"]
+        request = self.factory.get("/", {"fields": "language"}, HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        response = UserSettingsView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"language": "en"})
+
+    def test_bumped_version_changes_the_etag(self):
+        """Test that a QuerySet.update writer that bumps the version gets a new ETag."""
+        etag = self.call(UserSettingsView)["ETag"]
+        UserSettings.objects.filter(user=self.user).update(is_dark=True)
+        bump_versions([self.user.pk])
+
+        response = self.call(UserSettingsView, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertTrue(response.data["is_dark"])
+
+    def test_settings_if_match(self):
+        """Test optimistic concurrency on PUT with If-Match."""
+        etag = self.call(UserSettingsView)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.call(
+                UserSettingsView, "put", {"is_dark": True}, HTTP_IF_MATCH=etag
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(
+            self.call(UserSettingsView, HTTP_IF_NONE_MATCH=response["ETag"]).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+
+        response = self.call(UserSettingsView, "put", {"is_dark": False}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertTrue(UserSettings.objects.get(user=self.user).is_dark)
+
+        response = self.call(UserSettingsView, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_profile_etag_changes_with_the_user(self):
+        """Test that saving the user changes the profile ETag."""
+        etag = self.call(UserProfileView)["ETag"]
+        self.assertEqual(
+            self.call(UserProfileView, HTTP_IF_NONE_MATCH=etag).status_code,
+            status.HTTP_304_NOT_MODIFIED,
+        )
+        self.user.first_name = "Changed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.call(UserProfileView, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["first_name"], "Changed")
+
+    def test_tenant_memberships(self):
+        """Test conditional GET of the tenant membership list."""
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(reverse("tenant-list"))["ETag"]
+        response = self.client.get(reverse("tenant-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserOrganization.objects.create(user=self.user, tenant_id=uuid.uuid4())
+        response = self.client.get(reverse("tenant-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+
+class UserDeletionTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username="deleter@example.com",
+            email="deleter@example.com",
+            phone_number="+1555900000",
+            password="password123",
+        )
+        self.user = User.objects.create_user(
+            username="doomed@example.com",
+            email="doomed@example.com",
+            phone_number="+1555900001",
+            password="password123",
+        )
+        UserOrganization.objects.create(user=self.user, tenant_id=uuid.uuid4())
+        ip = IpAddress.objects.create(ip_address="203.0.113.9")
+        UserLocation.objects.bulk_create(
+            [UserLocation(user=self.user, ip_address=ip) for _ in range(25)]
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_destroy_tombstones_immediately(self):
+        """Test that the request only deactivates the user and queues the purge."""
+        response = self.client.delete(reverse("service-detail", args=[self.user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deleted_at)
+        self.assertFalse(get_principal(self.user.pk).is_active)
+        self.assertEqual(UserLocation.objects.filter(user=self.user).count(), 25)
+        self.assertTrue(
+            UserDeletion.objects.filter(user_id=self.user.pk, completed_at=None).exists()
+        )
+        response = self.client.get(reverse("service-detail", args=[self.user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_deletes_in_batches_and_tracks_progress(self):
+        """Test that the purge removes dependents in bounded batches, then the user."""
+        deletion = tombstone_user(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            purge_pending(batch_size=10)
+        batches = [
+            q["sql"]
+            for q in queries
+            if q["sql"].startswith('DELETE FROM "UserLocations"') and "LIMIT" in q["sql"]
+        ]
+        self.assertEqual(len(batches), 3)
+
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.completed_at)
+        self.assertEqual(deletion.deleted_rows["UserLocations"], 25)
+        self.assertEqual(deletion.deleted_rows["UserOrganizations"], 1)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(LoginIdentifier.objects.filter(user_id=self.user.pk).exists())
+        self.assertTrue(User.objects.filter(pk=self.admin.pk).exists())
+
+    def test_deleted_user_cannot_refresh(self):
+        """Test that deletion ends the user's sessions and outstanding tokens at once."""
+        refresh_results.clear()
+        refresh = generate_token_payload(self.user)
+        session = UserSession.objects.create(
+            user=self.user,
+            refresh_token=str(refresh),
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        get_session(session.session_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse("service-detail", args=[self.user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+
+        self.client.force_authenticate(None)
+        self.client.cookies["session_id"] = str(session.session_id)
+        response = self.client.post(reverse("token_refresh"))
+        self.assertNotEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(get_session(session.session_id))
+        self.assertEqual(User.objects.get(pk=self.user.pk).token_epoch, 1)
+
+
+class TenantOffboardingTests(APITestCase):
+    def setUp(self):
+        self.tenant_id = uuid.uuid4()
+        self.other_tenant_id = uuid.uuid4()
+        self.users = [
+            User.objects.create_user(
+                username=f"offboarded{i}@example.com",
+                email=f"offboarded{i}@example.com",
+                phone_number=f"+155590100{i}",
+                password="password123",
+            )
+            for i in range(5)
+        ]
+        for user in self.users:
+            UserOrganization.objects.create(user=user, tenant_id=self.tenant_id)
+            UserSession.objects.create(
+                user=user,
+                refresh_token="token",
+                expires_at=timezone.now() + timedelta(days=1),
+            )
+        # The first user also belongs to another tenant and keeps their session
+        UserOrganization.objects.create(user=self.users[0], tenant_id=self.other_tenant_id)
+
+    def test_offboarding_removes_memberships_in_batches(self):
+        """Test that members are removed batch by batch and orphans lose their sessions."""
+        offboarding = request_offboarding(self.tenant_id)
+        seen = []
+        offboard_tenant(offboarding, batch_size=2, progress=lambda o: seen.append(o.removed_memberships))
+
+        self.assertEqual(seen, [2, 4, 5])
+        offboarding.refresh_from_db()
+        self.assertIsNotNone(offboarding.completed_at)
+        self.assertEqual(offboarding.orphaned_users, 4)
+        self.assertEqual(offboarding.revoked_sessions, 4)
+        self.assertFalse(UserOrganization.objects.filter(tenant_id=self.tenant_id).exists())
+        self.assertEqual(UserSession.objects.get().user_id, self.users[0].pk)
+        self.assertEqual(User.objects.get(pk=self.users[1].pk).token_epoch, 1)
+        self.assertEqual(User.objects.get(pk=self.users[0].pk).token_epoch, 0)
+        self.assertEqual(get_claims(self.users[0].pk)["tenants"], [str(self.other_tenant_id)])
+
+    def test_offboarding_resumes_after_interruption(self):
+        """Test that a rerun picks up the memberships an earlier run left behind."""
+        offboarding = request_offboarding(self.tenant_id)
+
+        def interrupt(offboarding):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            offboard_tenant(offboarding, batch_size=2, progress=interrupt)
+        self.assertEqual(UserOrganization.objects.filter(tenant_id=self.tenant_id).count(), 3)
+
+        offboard_tenant(request_offboarding(self.tenant_id), batch_size=2)
+        offboarding.refresh_from_db()
+        self.assertEqual(offboarding.removed_memberships, 5)
+        self.assertEqual(offboarding.orphaned_users, 4)
+
+    def test_endpoint_requires_staff_and_queues_offboarding(self):
+        """Test that only staff can request an offboarding, which is queued."""
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(reverse("tenant-offboard"), {"tenant_id": str(self.tenant_id)})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.users[0].is_staff = True
+        self.users[0].save()
+        response = self.client.post(reverse("tenant-offboard"), {"tenant_id": str(self.tenant_id)})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["removed_memberships"], 0)
+        self.assertTrue(TenantOffboarding.objects.filter(tenant_id=self.tenant_id).exists())
+        self.assertEqual(UserOrganization.objects.filter(tenant_id=self.tenant_id).count(), 5)
+
+    def test_command_rejects_invalid_tenant(self):
+        """Test that a malformed tenant id is reported instead of crashing."""
+        with self.assertRaises(CommandError):
+            call_command("offboard_tenant", "not-a-uuid", stdout=io.StringIO())
+        self.assertFalse(TenantOffboarding.objects.exists())
+
+
+class TenantMemberDirectoryTests(APITestCase):
+    def setUp(self):
+        self.tenant_id = uuid.uuid4()
+        self.members = []
+        for i in range(5):
+            user = User.objects.create_user(
+                username=f"member{i}@example.com",
+                email=f"member{i}@example.com",
+                phone_number=f"+155590200{i}",
+                password="password123",
+            )
+            UserOrganization.objects.create(user=user, tenant_id=self.tenant_id)
+            self.members.append(user)
+        self.url = reverse("tenant-members", args=[self.tenant_id])
+        self.client.force_authenticate(self.members[0])
+
+    def test_members_are_paged_oldest_first_with_count(self):
+        """Test that members come back in membership order across pages."""
+        seen = []
+        url = self.url + "?page_size=2"
+        while url:
+            with self.assertNumQueries(3):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count"], 5)
+            seen.extend(member["email"] for member in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, [user.email for user in self.members])
+
+    def test_count_follows_membership_writes(self):
+        """Test that the counter tracks creates, moves, deletes and bulk inserts."""
+        other_tenant = uuid.uuid4()
+        membership = UserOrganization.objects.get(user=self.members[4])
+        membership.tenant_id = other_tenant
+        membership.save()
+        self.assertEqual(member_count(self.tenant_id), 4)
+        self.assertEqual(member_count(other_tenant), 1)
+
+        UserOrganization.objects.filter(user__in=self.members[:2]).delete()
+        self.assertEqual(member_count(self.tenant_id), 2)
+
+        provision_users(
+            [
+                {"email": f"bulkmember{i}@example.com", "first_name": "", "last_name": ""}
+                for i in range(3)
+            ],
+            self.tenant_id,
+        )
+        self.assertEqual(member_count(self.tenant_id), 5)
+
+        TenantMemberCount.objects.all().delete()
+        call_command("count_tenant_members", stdout=io.StringIO())
+        self.assertEqual(member_count(self.tenant_id), 5)
+        self.assertEqual(member_count(other_tenant), 1)
+
+    def test_members_require_membership(self):
+        """Test that outsiders cannot list a tenant's members."""
+        response = self.client.get(reverse("tenant-members", args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(SERVICE_TOKENS=["peer-service-token"])
+class MembershipCheckTests(APITestCase):
+    def setUp(self):
+        self.tenant_id = uuid.uuid4()
+        self.role = uuid.uuid4()
+        self.users = [
+            User.objects.create_user(
+                username=f"checked{i}@example.com",
+                email=f"checked{i}@example.com",
+                phone_number=f"+155590300{i}",
+                password="password123",
+            )
+            for i in range(4)
+        ]
+        for user in self.users[:3]:
+            UserOrganization.objects.create(user=user, tenant_id=self.tenant_id, role=self.role)
+        membership_index.rebuild()
+        self.client.credentials(HTTP_AUTHORIZATION="Service peer-service-token")
+
+    def check(self, user):
+        return membership_index.check([(user.pk, self.tenant_id)])[0]
+
+    def test_check_answers_from_memory(self):
+        """Test that a large batch is answered in order without touching the database."""
+        pairs = [
+            {"user_id": str(user.pk), "tenant_id": str(self.tenant_id)} for user in self.users
+        ] * 250
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse("tenant-check"), {"pairs": pairs}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(len(results), 1000)
+        self.assertEqual(
+            [result["member"] for result in results[:4]], [True, True, True, False]
+        )
+        self.assertEqual(results[0]["role"], str(self.role))
+        self.assertIsNone(results[3]["role"])
+
+    def test_sync_applies_membership_changes(self):
+        """Test that adds, role changes, moves and removals reach the index on sync."""
+        new_role = uuid.uuid4()
+        UserOrganization.objects.create(user=self.users[3], tenant_id=self.tenant_id)
+        membership = UserOrganization.objects.get(user=self.users[0])
+        membership.role = new_role
+        membership.save()
+        UserOrganization.objects.filter(user=self.users[1]).delete()
+        moved = UserOrganization.objects.get(user=self.users[2])
+        moved.tenant_id = uuid.uuid4()
+        moved.save()
+
+        membership_index.sync(force=True)
+        self.assertEqual(self.check(self.users[0]), (True, new_role))
+        self.assertEqual(self.check(self.users[1]), (False, None))
+        self.assertEqual(self.check(self.users[2]), (False, None))
+        self.assertEqual(self.check(self.users[3]), (True, None))
+        self.assertEqual(
+            membership_index.check([(self.users[2].pk, moved.tenant_id)]), [(True, self.role)]
+        )
+
+    def test_removal_is_applied_without_reloading_the_tenant(self):
+        """Test that a sync reads the removal log, not the tenant's memberships."""
+        UserOrganization.objects.filter(user=self.users[0]).delete()
+        with CaptureQueriesContext(connection) as queries:
+            membership_index.sync(force=True)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('"tenant_id" IN' in q["sql"] for q in queries))
+        self.assertEqual(self.check(self.users[0]), (False, None))
+        self.assertEqual(self.check(self.users[1]), (True, self.role))
+
+    def test_removed_and_added_back_stays_a_member(self):
+        """Test that a removal followed by a re-add within one window keeps the member."""
+        UserOrganization.objects.filter(user=self.users[0]).delete()
+        UserOrganization.objects.create(user=self.users[0], tenant_id=self.tenant_id)
+        membership_index.sync(force=True)
+        self.assertEqual(self.check(self.users[0]), (True, None))
+
+    def test_swap_within_one_sync_window(self):
+        """Test that a removal offset by an addition (same count) is still seen."""
+        UserOrganization.objects.filter(user=self.users[0]).delete()
+        UserOrganization.objects.create(user=self.users[3], tenant_id=self.tenant_id)
+        membership_index.sync(force=True)
+        self.assertEqual(self.check(self.users[0]), (False, None))
+        self.assertEqual(self.check(self.users[3]), (True, None))
+
+    def test_sync_after_rebuilding_an_empty_table(self):
+        """Test that memberships created after an empty rebuild become visible on sync."""
+        UserOrganization.objects.all().delete()
+        membership_index.rebuild()
+        UserOrganization.objects.create(user=self.users[0], tenant_id=self.tenant_id)
+        membership_index.sync(force=True)
+        self.assertEqual(self.check(self.users[0]), (True, None))
+
+    def test_check_is_served_at_the_documented_path(self):
+        """Test that POST /users/tenant/check resolves without a trailing slash."""
+        self.assertEqual(reverse("tenant-check"), "/api/auth/users/tenant/check")
+
+    def test_check_requires_service_credential(self):
+        """Test that anonymous callers cannot query memberships."""
+        self.client.credentials()
+        pairs = [{"user_id": str(self.users[0].pk), "tenant_id": str(self.tenant_id)}]
+        response = self.client.post(reverse("tenant-check"), {"pairs": pairs}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_pairs_are_rejected(self):
+        """Test that malformed pairs fail validation."""
+        response = self.client.post(
+            reverse("tenant-check"), {"pairs": [{"user_id": "nope"}]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StubTenantService(BaseHTTPRequestHandler):
+    """Tenant service stand-in; behaviour is driven by attributes on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        server.connections.add(self.client_address)
+        if server.failures:
+            server.failures -= 1
+            return self.reply(503, {"error": "unavailable"})
+        time.sleep(server.delay)
+
+        url = urlparse(self.path)
+        ids = parse_qs(url.query).get("ids")
+        if ids:
+            tenants = ids[0].split(",")
+            return self.reply(200, [server.tenant(t) for t in tenants if t in server.known])
+        tenant_id = url.path.rstrip("/").rsplit("/", 1)[-1]
+        if tenant_id in server.known:
+            return self.reply(200, server.tenant(tenant_id))
+        if url.path.rstrip("/").endswith("tenant"):
+            return self.reply(200, [server.tenant(t) for t in server.known])
+        return self.reply(404, {"error": "not found"})
+
+    def reply(self, status_code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class TenantClientTests(APITestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubTenantService)
+        self.server.known = {str(uuid.uuid4()) for _ in range(5)}
+        self.server.name = "Acme"
+        self.server.tenant = lambda t: {"id": t, "name": self.server.name}
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.failures = 0
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.tenant_ids = sorted(self.server.known)
+
+    def client_for(self, **kwargs):
+        options = {"retries": 2, "backoff": 0, "backoff_jitter": 0, "read_timeout": 1, **kwargs}
+        client = TenantClient(
+            f"http://127.0.0.1:{self.server.server_address[1]}/api/tenant/", **options
+        )
+        self.addCleanup(client.session.close)
+        return client
+
+    def test_batch_lookup_is_cached_and_reuses_connections(self):
+        """Test that a batch is one request, later lookups hit the cache, and keep-alive holds."""
+        client = self.client_for(batch_size=3)
+        tenants = client.get_tenants(self.tenant_ids + [str(uuid.uuid4())])
+        self.assertEqual(set(tenants), set(self.tenant_ids))
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.assertEqual(client.get_tenant(self.tenant_ids[0])["name"], "Acme")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertIsNone(client.get_tenant(uuid.uuid4()))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retries_transient_failures(self):
+        """Test that 503s are retried and a dead service raises TenantServiceError."""
+        client = self.client_for()
+        self.server.failures = 2
+        self.assertEqual(client.get_tenant(self.tenant_ids[0])["id"], self.tenant_ids[0])
+        self.assertEqual(len(self.server.requests), 3)
+
+        self.server.failures = 10
+        with self.assertRaises(TenantServiceError):
+            client.fetch_tenant(self.tenant_ids[0])
+
+    def test_read_timeout(self):
+        """Test that a slow service fails fast instead of hanging the caller."""
+        client = self.client_for(retries=0, read_timeout=0.1)
+        self.server.delay = 0.5
+        started = time.monotonic()
+        with self.assertRaises(TenantServiceError):
+            client.get_tenant(self.tenant_ids[0])
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_stale_while_revalidate(self):
+        """Test that a stale tenant is served at once and refreshed in the background."""
+        client = self.client_for(ttl=0, stale_ttl=60)
+        client.get_tenant(self.tenant_ids[0])
+        self.server.name = "Renamed"
+        self.server.delay = 0.2
+
+        started = time.monotonic()
+        self.assertEqual(client.get_tenant(self.tenant_ids[0])["name"], "Acme")
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        deadline = time.monotonic() + 5
+        while client.cache.get(self.tenant_ids[0])[1]["name"] != "Renamed":
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def test_revalidation_evicts_deleted_tenant(self):
+        """Test that a tenant the service no longer knows is dropped on revalidation."""
+        client = self.client_for(ttl=0, stale_ttl=60)
+        tenant_id = self.tenant_ids[0]
+        client.get_tenant(tenant_id)
+        self.server.known.discard(tenant_id)
+
+        self.assertEqual(client.get_tenant(tenant_id)["id"], tenant_id)
+        deadline = time.monotonic() + 5
+        while client.cache.get(tenant_id, None) is not None:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+        self.assertIsNone(client.get_tenant(tenant_id))
@@ -14,6 +14,9 @@ urlpatterns = [
     path("logout/", LogoutView.as_view(), name="logout"),
     path("refresh/", RefreshTokenView.as_view(), name="token_refresh"),
     path("logout/all", LogoutAllView.as_view(), name="logout_session"),
+    path(".well-known/jwks.json", JWKSView.as_view(), name="jwks"),
+    path("introspect/", IntrospectionView.as_view(), name="introspect"),
+    path("users/tenant/check", MembershipCheckView.as_view(), name="tenant-check"),
     # path("token/refresh/", TokenRefreshView.as_view(), name="refresh"),
     path("users/location/", UserIPLocationView.as_view(), name="user-location"),
     # path("users/tenant/<str:tenant_id>/", UserTenantView.as_view(), name="user-tenant-detail"),
@@ -0,0 +1,105 @@
+"""
+Two-phase user deletion.
+
+``tombstone_user`` runs in the request: it deactivates the user, stamps
+``deleted_at``, ends their sessions, bumps their token epoch and records a
+``UserDeletion``, so authentication and refresh stop working immediately. ``purge_user`` later removes every row that
+cascades from the user, table by table, in batches of ``batch_size`` rows with
+one short DELETE per batch, and finally the user row itself. Nothing is loaded
+into memory and no lock is held across batches, so a user with a long history
+costs many small transactions instead of one huge one. Progress is saved on the
+``UserDeletion`` after every batch, and an interrupted purge resumes where it
+stopped.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from users.models import UserDeletion, UserOrganization, UserSession
+from users.utils.auth.epoch import bump_token_epoch
+from users.utils.auth.sessions import invalidate_sessions
+
+User = get_user_model()
+
+
+def dependents():
+    """``(model, column)`` for every table whose rows are cascaded from a user."""
+    return [
+        (relation.related_model, relation.field.column)
+        for relation in User._meta.get_fields(include_hidden=True)
+        if relation.one_to_many
+        and relation.auto_created
+        and relation.on_delete is models.CASCADE
+    ]
+
+
+def tombstone_user(user, requested_by=None):
+    """Deactivate ``user`` now and queue their rows for purging."""
+    with transaction.atomic():
+        user.is_active = False
+        user.deleted_at = timezone.now()
+        user.save(update_fields=["is_active", "deleted_at"])
+        sessions = UserSession.objects.filter(user_id=user.pk)
+        session_ids = list(sessions.values_list("session_id", flat=True))
+        sessions.delete()
+        bump_token_epoch(user.pk)
+        deletion, _ = UserDeletion.objects.get_or_create(
+            user_id=user.pk, defaults={"requested_by": requested_by}
+        )
+        transaction.on_commit(lambda: invalidate_sessions(session_ids))
+    return deletion
+
+
+def _delete_batch(model, column, user_id, batch_size):
+    quote = connection.ops.quote_name
+    table, pk = quote(model._meta.db_table), quote(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {pk} IN "
+            f"(SELECT {pk} FROM {table} WHERE {quote(column)} = %s LIMIT %s)",
+            [User._meta.pk.get_db_prep_value(user_id, connection), batch_size],
+        )
+        return cursor.rowcount
+
+
+def purge_user(deletion, batch_size=None):
+    """Delete every row of the user behind ``deletion``, one batch at a time."""
+    batch_size = batch_size or settings.USER_PURGE_BATCH_SIZE
+    # A user has few memberships; deleting them through the ORM keeps the
+    # tenant member counts and the membership caches in step.
+    with transaction.atomic():
+        removed, _ = UserOrganization.objects.filter(user_id=deletion.user_id).delete()
+        if removed:
+            table = UserOrganization._meta.db_table
+            deletion.deleted_rows[table] = deletion.deleted_rows.get(table, 0) + removed
+            deletion.save(update_fields=["deleted_rows", "updated_at"])
+
+    for model, column in dependents():
+        table = model._meta.db_table
+        while True:
+            deleted = _delete_batch(model, column, deletion.user_id, batch_size)
+            if deleted:
+                deletion.deleted_rows[table] = deletion.deleted_rows.get(table, 0) + deleted
+                deletion.save(update_fields=["deleted_rows", "updated_at"])
+            if deleted < batch_size:
+                break
+
+    # Nothing cascades any more, so this is a single-row delete (and it still
+    # sends the post_delete signals that clear the user's cached state).
+    with transaction.atomic():
+        User.objects.filter(pk=deletion.user_id).delete()
+        deletion.completed_at = timezone.now()
+        deletion.save(update_fields=["completed_at", "updated_at"])
+    return deletion
+
+
+def purge_pending(batch_size=None, limit=None):
+    """Purge pending deletions, oldest first. Returns how many were completed."""
+    pending = UserDeletion.objects.filter(completed_at__isnull=True).order_by("created_at")
+    purged = 0
+    for deletion in pending[:limit] if limit else pending:
+        purge_user(deletion, batch_size)
+        purged += 1
+    return purged
@@ -0,0 +1,93 @@
+"""
+Tenant offboarding.
+
+``offboard_tenant`` removes a tenant's ``UserOrganization`` rows
+``batch_size`` at a time, walking the ``(tenant_id, created_at)`` index, so the
+cost is linear in the size of the tenant. Each batch runs in one transaction
+and:
+
+    * deletes the memberships through the ORM, so the membership signals
+      patch the claims and principal caches of every affected user;
+    * finds the users of the batch that are left without any tenant, deletes
+      their sessions and bumps their token epoch, so their access tokens stop
+      working too;
+    * adds its counts to the ``TenantOffboarding`` row.
+
+A batch either commits with its progress or not at all. Rerunning an
+interrupted offboarding picks up the memberships that are left.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from users.models import TenantOffboarding, UserOrganization, UserSession
+from users.utils.auth.epoch import bump_token_epochs
+from users.utils.auth.sessions import invalidate_sessions
+
+
+def request_offboarding(tenant_id, requested_by=None):
+    offboarding, _ = TenantOffboarding.objects.get_or_create(
+        tenant_id=tenant_id, defaults={"requested_by": requested_by}
+    )
+    return offboarding
+
+
+def _offboard_batch(offboarding, batch_size):
+    """Process one batch; returns the number of memberships removed."""
+    with transaction.atomic():
+        memberships = UserOrganization.objects.filter(tenant_id=offboarding.tenant_id)
+        user_ids = list(
+            memberships.order_by("created_at", "id").values_list("user_id", flat=True)[
+                :batch_size
+            ]
+        )
+        if not user_ids:
+            return 0
+        memberships.filter(user_id__in=user_ids).delete()
+
+        orphans = set(user_ids) - set(
+            UserOrganization.objects.filter(user_id__in=user_ids).values_list(
+                "user_id", flat=True
+            )
+        )
+        sessions = UserSession.objects.filter(user_id__in=orphans)
+        session_ids = list(sessions.values_list("session_id", flat=True))
+        if orphans:
+            sessions.delete()
+            bump_token_epochs(orphans)
+            transaction.on_commit(lambda: invalidate_sessions(session_ids))
+
+        TenantOffboarding.objects.filter(pk=offboarding.pk).update(
+            removed_memberships=F("removed_memberships") + len(user_ids),
+            orphaned_users=F("orphaned_users") + len(orphans),
+            revoked_sessions=F("revoked_sessions") + len(session_ids),
+            updated_at=timezone.now(),
+        )
+    return len(user_ids)
+
+
+def offboard_tenant(offboarding, batch_size=None, progress=None):
+    """
+    Run ``offboarding`` to completion. ``progress(offboarding)`` is called
+    after every batch with the refreshed counters.
+    """
+    batch_size = batch_size or settings.TENANT_OFFBOARDING_BATCH_SIZE
+    while _offboard_batch(offboarding, batch_size):
+        offboarding.refresh_from_db()
+        if progress is not None:
+            progress(offboarding)
+
+    offboarding.completed_at = timezone.now()
+    offboarding.save(update_fields=["completed_at", "updated_at"])
+    return offboarding
+
+
+def offboard_pending(batch_size=None):
+    """Run every offboarding that has not completed, oldest first."""
+    pending = TenantOffboarding.objects.filter(completed_at__isnull=True).order_by(
+        "created_at"
+    )
+    for offboarding in pending:
+        offboard_tenant(offboarding, batch_size)
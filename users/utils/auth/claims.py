@@ -0,0 +1,86 @@
+"""
+Materialized token claims, one cached document per user.
+
+The document holds everything ``generate_token_payload`` puts in a token
+(email, language, timezone, is_superuser, token_epoch, tenants) so minting a
+token on login or refresh does not touch the database. It is built with a
+single query on a miss and dropped by the signals in ``users/signals.py`` when
+the user, their settings or their memberships change; dropping rather than
+patching means concurrent writers cannot lose each other's updates.
+
+Without a shared ``AUTH_CACHE`` alias those drops stay in the writing worker,
+so documents are then kept for only ``LOCAL_TTL`` seconds.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+
+from users.models import UserSettings
+from users.utils.cache.ttl import TTLCache, MISSING
+
+User = get_user_model()
+
+USER_CLAIMS = ("email", "timezone", "is_superuser", "token_epoch")
+
+claims_cache = TTLCache(
+    "claims",
+    ttl=settings.AUTH_CACHE["CLAIMS_TTL"],
+    alias=settings.AUTH_CACHE["ALIAS"],
+    local_ttl=settings.AUTH_CACHE["LOCAL_TTL"],
+    coherent=True,
+)
+
+
+def build_claims(user_id):
+    """Read the claims document from the database, or None if the user is gone."""
+    rows = list(
+        User.objects.filter(pk=user_id)
+        .annotate(
+            settings_language=Subquery(
+                UserSettings.objects.filter(user=OuterRef("pk")).values("language")[:1]
+            )
+        )
+        .values(*USER_CLAIMS, "settings_language", "organizations__tenant_id")
+    )
+    if not rows:
+        return None
+    return make_claims(rows)
+
+
+def make_claims(rows):
+    """
+    Fold rows of ``User.values(*USER_CLAIMS, "settings_language",
+    "organizations__tenant_id")`` (one per membership) into a claims document.
+    """
+    claims = {field: rows[0][field] for field in USER_CLAIMS}
+    claims["language"] = rows[0]["settings_language"] or "en"
+    claims["tenants"] = [
+        str(row["organizations__tenant_id"])
+        for row in rows
+        if row["organizations__tenant_id"] is not None
+    ]
+    return claims
+
+
+def get_claims(user_id):
+    claims = claims_cache.get(user_id)
+    if claims is MISSING:
+        claims = build_claims(user_id)
+        if claims is not None:
+            claims_cache.set(user_id, claims)
+    return claims
+
+
+def store_claims(user_id, claims):
+    claims_cache.set(user_id, claims)
+
+
+def drop_claims(user_id):
+    claims_cache.delete(user_id)
+
+
+def apply_claims(token, claims):
+    for name, value in claims.items():
+        token[name] = value
+    return token
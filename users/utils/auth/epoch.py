@@ -0,0 +1,44 @@
+"""
+Per-user token epoch.
+
+Every token carries the ``token_epoch`` of its user at the time it was minted,
+and authentication rejects tokens whose epoch is behind the user's current one
+(read from the principal snapshot, so the check costs no query). Bumping the
+counter therefore invalidates every outstanding token of the user with a single
+UPDATE, however many sessions or devices they have.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from users.utils.auth.claims import drop_claims
+from users.utils.auth.principals import bump_version
+
+User = get_user_model()
+
+
+def _forget(user_ids):
+    for user_id in user_ids:
+        bump_version(user_id)
+        drop_claims(user_id)
+
+
+def bump_token_epochs(user_ids):
+    """Invalidate every token issued so far to each of the users, in one UPDATE."""
+    user_ids = list(user_ids)
+    # update() skips the post_save signals, so drop the cached copies here,
+    # once now and once more after commit in case a reader re-cached the old row.
+    User.objects.filter(pk__in=user_ids).update(token_epoch=F("token_epoch") + 1)
+    _forget(user_ids)
+    transaction.on_commit(lambda: _forget(user_ids))
+
+
+def bump_token_epoch(user_id):
+    """Invalidate every token issued to the user so far."""
+    bump_token_epochs([user_id])
+
+
+def is_token_stale(payload, token_epoch):
+    """True if the token was minted before the user's current ``token_epoch``."""
+    return payload.get("token_epoch", 0) < token_epoch
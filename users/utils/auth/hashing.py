@@ -0,0 +1,187 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 verification is deliberately slow, so running it inline lets a burst of
+logins starve every other endpoint. ``HashingService`` runs hashes in a small
+process pool and admits at most ``WORKERS + QUEUE_DEPTH`` jobs at a time; when
+it is saturated it raises ``HashingUnavailable`` (503) immediately instead of
+queueing the request behind everyone else. A job that does not finish within
+``TIMEOUT`` seconds also raises ``HashingUnavailable``.
+
+Bulk hashing (``make_passwords``) runs in its own ``provisioning_hashing_service``
+pool in small chunks, so provisioning thousands of users cannot hold the
+workers that logins are waiting for.
+
+``verify_password`` also upgrades the stored hash when the configured hasher or
+its work factor has changed, just like ``AbstractBaseUser.check_password``.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Authentication is temporarily overloaded, please retry shortly."
+    default_code = "hashing_unavailable"
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+
+def _verify(password, encoded):
+    return hashers.verify_password(password, encoded)
+
+
+def _make(password):
+    return hashers.make_password(password)
+
+
+def _make_many(passwords):
+    return [hashers.make_password(password) for password in passwords]
+
+
+class HashingService:
+    def __init__(self, workers, queue_depth, timeout, chunk_size=50):
+        self.workers = workers
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_depth)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # Build the pool lazily and again after a fork (e.g. preloaded workers).
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_setup_worker
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args, wait=None):
+        """Run ``fn(*args)`` in the pool; wait up to ``wait`` seconds for a slot."""
+        acquired = (
+            self._slots.acquire(timeout=wait) if wait else self._slots.acquire(blocking=False)
+        )
+        if not acquired:
+            self.rejected += 1
+            raise HashingUnavailable()
+
+        started = time.perf_counter()
+
+        def done(_):
+            self._slots.release()
+            self._latencies.append(time.perf_counter() - started)
+            self.completed += 1
+
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except Exception:
+                self._slots.release()
+                raise
+        future.add_done_callback(done)
+        return future
+
+    def _result(self, future, timeout):
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            raise HashingUnavailable()
+
+    def check_password(self, password, encoded):
+        """Return (is_correct, must_update) for ``password`` against ``encoded``."""
+        return self._result(self.submit(_verify, password, encoded), self.timeout)
+
+    def make_password(self, password):
+        return self._result(self.submit(_make, password), self.timeout)
+
+    def make_passwords(self, passwords):
+        """
+        Hash many passwords, ``chunk_size`` per job, with at most one job per
+        worker in flight; later chunks wait for a slot instead of failing.
+        """
+        passwords = list(passwords)
+        size = max(self.chunk_size, 1)
+        timeout = self.timeout * size
+        in_flight, encoded = deque(), []
+        for start in range(0, len(passwords), size):
+            if len(in_flight) >= max(self.workers, 1):
+                encoded.extend(self._result(in_flight.popleft(), timeout))
+            in_flight.append(
+                self.submit(_make_many, passwords[start : start + size], wait=timeout)
+            )
+        while in_flight:
+            encoded.extend(self._result(in_flight.popleft(), timeout))
+        return encoded
+
+    async def acheck_password(self, password, encoded):
+        return await asyncio.wrap_future(self.submit(_verify, password, encoded))
+
+    async def amake_password(self, password):
+        return await asyncio.wrap_future(self.submit(_make, password))
+
+    def get_stats(self):
+        latencies = sorted(self._latencies)
+        percentile = lambda p: latencies[int(p * (len(latencies) - 1))] if latencies else None
+        return {
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+            "latency_max": latencies[-1] if latencies else None,
+        }
+
+
+hashing_service = HashingService(
+    workers=settings.PASSWORD_HASHING["WORKERS"],
+    queue_depth=settings.PASSWORD_HASHING["QUEUE_DEPTH"],
+    timeout=settings.PASSWORD_HASHING["TIMEOUT"],
+)
+
+provisioning_hashing_service = HashingService(
+    workers=settings.PASSWORD_HASHING["PROVISIONING_WORKERS"],
+    queue_depth=0,
+    timeout=settings.PASSWORD_HASHING["TIMEOUT"],
+    chunk_size=settings.PASSWORD_HASHING["PROVISIONING_CHUNK_SIZE"],
+)
+
+
+def verify_password(user, password):
+    """
+    Check ``password`` for ``user`` in the hashing pool and transparently
+    rehash it with the configured hasher on success.
+    """
+    is_correct, must_update = hashing_service.check_password(password, user.password)
+    if is_correct and must_update:
+        user.password = hashing_service.make_password(password)
+        user.save(update_fields=["password"])
+    return is_correct
+
+
+def hash_password(password):
+    return hashing_service.make_password(password)
@@ -0,0 +1,73 @@
+"""
+Normalized login identifiers.
+
+Emails are matched case-insensitively and phone numbers in any common notation
+("+1 937-723-0086", "(937) 723 0086", "9377230086"), so both are reduced to a
+canonical form (lowercase email, E.164 phone number) and stored in
+``LoginIdentifier``. Every login path normalizes what the caller typed the same
+way and resolves the user with one equality lookup on the unique ``value``
+index.
+"""
+
+import phonenumbers
+from django.conf import settings
+
+from users.models import LoginIdentifier
+
+
+def normalize_email(value):
+    value = (value or "").strip().lower()
+    local, _, domain = value.partition("@")
+    if not local or "." not in domain:
+        return None
+    return value
+
+
+def normalize_phone(value):
+    """E.164 form of ``value``, or None if it cannot be a phone number."""
+    if not value:
+        return None
+    try:
+        number = phonenumbers.parse(value, settings.PHONE_DEFAULT_REGION)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(number):
+        return None
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_identifier(value):
+    """Canonical form of an email address or phone number typed at login."""
+    if "@" in (value or ""):
+        return normalize_email(value)
+    return normalize_phone(value)
+
+
+def identifiers_for(email, phone_number):
+    """``{kind: value}`` for the identifiers a user with these columns logs in with."""
+    identifiers = {
+        LoginIdentifier.EMAIL: normalize_email(email),
+        LoginIdentifier.PHONE: normalize_phone(phone_number),
+    }
+    return {kind: value for kind, value in identifiers.items() if value}
+
+
+def make_identifiers(user_id, email, phone_number):
+    return [
+        LoginIdentifier(user_id=user_id, kind=kind, value=value)
+        for kind, value in identifiers_for(email, phone_number).items()
+    ]
+
+
+def sync_identifiers(user):
+    """Bring the user's ``LoginIdentifier`` rows in line with their email and phone."""
+    identifiers = make_identifiers(user.pk, user.email, user.phone_number)
+    LoginIdentifier.objects.filter(user_id=user.pk).exclude(
+        value__in=[identifier.value for identifier in identifiers]
+    ).delete()
+    # A value already claimed (by this user, or by a legacy duplicate) is skipped.
+    LoginIdentifier.objects.bulk_create(identifiers, ignore_conflicts=True)
+
+
+def identifier_taken(value):
+    return value is not None and LoginIdentifier.objects.filter(value=value).exists()
@@ -0,0 +1,80 @@
+"""
+Batch introspection of access tokens and session ids.
+
+All tokens are decoded first, then every referenced ``AuthUser`` and every
+requested ``UserSession`` is loaded with a single ``IN`` query each, so the cost
+of a batch is two queries regardless of its size.
+"""
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import UserSession
+from users.utils.auth.tokens import AccessToken
+from users.utils.auth.revocation import is_token_revoked
+from users.utils.auth.epoch import is_token_stale
+
+User = get_user_model()
+
+
+def introspect(tokens=(), session_ids=()):
+    decoded = []
+    for raw_token in tokens:
+        try:
+            payload = AccessToken(raw_token).payload
+        except TokenError:
+            payload = None
+        decoded.append(None if payload and is_token_revoked(payload) else payload)
+
+    session_ids = [str(session_id) for session_id in session_ids]
+    sessions = {
+        str(row["session_id"]): row
+        for row in UserSession.objects.filter(session_id__in=session_ids).values(
+            "session_id", "user_id", "expires_at"
+        )
+    }
+
+    user_ids = {
+        str(claims[api_settings.USER_ID_CLAIM])
+        for claims in decoded
+        if claims and claims.get(api_settings.USER_ID_CLAIM)
+    }
+    user_ids.update(str(row["user_id"]) for row in sessions.values())
+    active_users = {
+        str(user_id): token_epoch
+        for user_id, token_epoch in User.objects.filter(
+            id__in=user_ids, is_active=True
+        ).values_list("id", "token_epoch")
+    }
+
+    token_results = []
+    for claims in decoded:
+        user_id = claims and str(claims.get(api_settings.USER_ID_CLAIM))
+        if (
+            claims
+            and user_id in active_users
+            and not is_token_stale(claims, active_users[user_id])
+        ):
+            token_results.append({"active": True, "claims": claims})
+        else:
+            token_results.append({"active": False})
+
+    now = timezone.now()
+    session_results = []
+    for session_id in session_ids:
+        row = sessions.get(session_id)
+        if row and row["expires_at"] > now and str(row["user_id"]) in active_users:
+            session_results.append(
+                {
+                    "session_id": session_id,
+                    "active": True,
+                    "user_id": str(row["user_id"]),
+                    "expires_at": row["expires_at"],
+                }
+            )
+        else:
+            session_results.append({"session_id": session_id, "active": False})
+
+    return {"tokens": token_results, "sessions": session_results}
@@ -0,0 +1,146 @@
+"""
+Asymmetric JWT signing keys and the token backend that uses them.
+
+Private keys are PEM files in ``JWT_SIGNING["KEYS_DIR"]``. Files are ordered by
+name and the last one signs new tokens; every key in the directory is published
+in the JWKS document and accepted for verification, which is what makes
+rotation safe:
+
+    1. ``manage.py generate_signing_key`` writes a new, later-named key file.
+    2. Restart/reload workers; new tokens carry the new ``kid``.
+    3. Delete the old file once ``REFRESH_TOKEN_LIFETIME`` has passed.
+
+RSA keys sign with RS256 and Ed25519 keys with EdDSA. When no keys are
+configured the backend falls back to the HS256 ``SIGNING_KEY`` from
+``SIMPLE_JWT`` and the JWKS document is empty.
+"""
+
+import base64
+import hashlib
+import json
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+SigningKey = namedtuple("SigningKey", ["kid", "algorithm", "private_key", "public_key", "jwk"])
+
+# Members of each key type that make up the RFC 7638 thumbprint.
+THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "OKP": ("crv", "kty", "x")}
+
+
+def jwk_thumbprint(jwk):
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(
+        json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+    ).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def load_signing_key(pem):
+    private_key = serialization.load_pem_private_key(pem, password=None)
+    public_key = private_key.public_key()
+
+    if isinstance(private_key, rsa.RSAPrivateKey):
+        algorithm, jwk = "RS256", RSAAlgorithm.to_jwk(public_key, as_dict=True)
+    elif isinstance(private_key, ed25519.Ed25519PrivateKey):
+        algorithm, jwk = "EdDSA", OKPAlgorithm.to_jwk(public_key, as_dict=True)
+    else:
+        raise ValueError("Only RSA and Ed25519 signing keys are supported.")
+
+    kid = jwk_thumbprint(jwk)
+    jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+    return SigningKey(kid, algorithm, private_key, public_key, jwk)
+
+
+@lru_cache(maxsize=None)
+def get_signing_keys():
+    """Return the configured keys, oldest first; the last one signs."""
+    keys_dir = settings.JWT_SIGNING["KEYS_DIR"]
+    if not keys_dir:
+        return ()
+    return tuple(
+        load_signing_key(path.read_bytes())
+        for path in sorted(Path(keys_dir).glob("*.pem"))
+    )
+
+
+def get_jwks():
+    return {"keys": [key.jwk for key in get_signing_keys()]}
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    Signs with the newest configured key (``kid`` in the header) and verifies
+    with whichever published key the token names.
+    """
+
+    def __init__(self, keys):
+        self.keys = {key.kid: key for key in keys}
+        self.current = keys[-1] if keys else None
+        super().__init__(
+            self.current.algorithm if self.current else api_settings.ALGORITHM,
+            api_settings.SIGNING_KEY,
+            api_settings.VERIFYING_KEY,
+            api_settings.AUDIENCE,
+            api_settings.ISSUER,
+            None,
+            api_settings.LEEWAY,
+            api_settings.JSON_ENCODER,
+        )
+
+    def encode(self, payload):
+        if self.current is None:
+            return super().encode(payload)
+
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.current.private_key,
+            algorithm=self.current.algorithm,
+            headers={"kid": self.current.kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        if self.current is None:
+            return super().decode(token, verify=verify)
+
+        try:
+            key = self.keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                raise TokenBackendError(_("Token is invalid or expired"))
+
+            return jwt.decode(
+                token,
+                key.public_key,
+                algorithms=[key.algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    "verify_aud": self.audience is not None,
+                    "verify_signature": verify,
+                },
+            )
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError(_("Token is invalid or expired")) from ex
+
+
+@lru_cache(maxsize=None)
+def get_token_backend():
+    return KeyRingTokenBackend(get_signing_keys())
@@ -0,0 +1,138 @@
+"""
+Login pipeline with a fixed query budget.
+
+A successful login costs at most ``LOGIN_QUERY_BUDGET`` queries:
+
+    1. ``find_login_user`` looks the user up by normalized identifier and
+       loads their language setting, their tenant ids and the id of the
+       caller's ``IpAddress`` row in the same SELECT.
+    2. ``persist_login`` updates ``last_login`` ...
+    3. ... and upserts the device session with one ``INSERT ... ON CONFLICT
+       DO UPDATE`` on the user/user_agent/ip_address key, both in one
+       transaction.
+
+A device that logs in again keeps its ``session_id`` and only gets a fresh
+refresh token and expiry, so no cached session has to be evicted. Only the
+first login from an unseen IP address costs one extra INSERT.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from users.models import IpAddress, UserSession, UserSettings
+from users.utils.auth.claims import make_claims
+
+User = get_user_model()
+
+LOGIN_QUERY_BUDGET = 3
+
+USER_FIELDS = [
+    "id",
+    "password",
+    "email",
+    "is_active",
+    "is_superuser",
+    "timezone",
+    "token_epoch",
+]
+
+
+def find_login_user(identifier, ip_address):
+    """
+    Return ``(user, claims, ip_address_id)`` for the active user owning the
+    normalized login ``identifier`` (see ``identifiers.py``), or
+    ``(None, None, None)``. ``claims`` is the user's token claims document
+    (see ``claims.py``).
+    """
+    rows = list(
+        User.objects.filter(is_active=True, login_identifiers__value=identifier)
+        .annotate(
+            settings_language=Subquery(
+                UserSettings.objects.filter(user=OuterRef("pk")).values("language")[:1]
+            ),
+            known_ip_address_id=Subquery(
+                IpAddress.objects.filter(ip_address=ip_address).values("id")[:1]
+            ),
+        )
+        .values(
+            *USER_FIELDS,
+            "settings_language",
+            "known_ip_address_id",
+            "organizations__tenant_id",
+        )
+    )
+    if not rows:
+        return None, None, None
+
+    row = rows[0]
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in USER_FIELDS]
+    user = User.from_db("default", fields, [row[field] for field in fields])
+    claims = make_claims(rows)
+    return user, claims, row["known_ip_address_id"]
+
+
+def _upsert_session(session):
+    """
+    Insert ``session`` or, for a device that already has one, refresh its
+    token and expiry; returns the stored ``(id, session_id)``.
+    """
+    quote = connection.ops.quote_name
+    fields = UserSession._meta.concrete_fields
+    columns = {field.attname: quote(field.column) for field in fields}
+    # NULLs never conflict on the device key; the partial key covers them.
+    if session.ip_address_id is None:
+        target = f"({columns['user_id']}, {columns['user_agent']}) WHERE {columns['ip_address_id']} IS NULL"
+    else:
+        target = f"({columns['user_id']}, {columns['user_agent']}, {columns['ip_address_id']})"
+    updated = ", ".join(
+        f"{columns[name]} = EXCLUDED.{columns[name]}"
+        for name in ("refresh_token", "expires_at", "updated_at")
+    )
+    sql = (
+        f"INSERT INTO {quote(UserSession._meta.db_table)} ({', '.join(columns.values())}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"ON CONFLICT {target} DO UPDATE SET {updated} "
+        f"RETURNING {columns['id']}, {columns['session_id']}"
+    )
+    params = [
+        field.get_db_prep_save(getattr(session, field.attname), connection) for field in fields
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def persist_login(user, refresh, ip_address, ip_address_id, user_agent):
+    """
+    Record the login and return the device's ``UserSession``. An existing
+    session for the same user, user agent and IP address (or lack of one) is
+    kept, with a fresh refresh token and expiry.
+    """
+    now = timezone.now()
+    # No savepoint: the upsert is a single statement and nothing is retried.
+    with transaction.atomic(savepoint=False):
+        if ip_address_id is None and ip_address:
+            ip_address_id = IpAddress.objects.create(ip_address=ip_address).id
+
+        User.objects.filter(pk=user.pk).update(last_login=now)
+
+        session = UserSession(
+            user_id=user.pk,
+            user_agent=(user_agent or "")[:255],
+            ip_address_id=ip_address_id,
+            refresh_token=str(refresh),
+            expires_at=now + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"],
+            created_at=now,
+            updated_at=now,
+        )
+        pk, session_id = _upsert_session(session)
+
+    opts = UserSession._meta
+    session.pk = opts.pk.to_python(pk)
+    session.session_id = opts.get_field("session_id").to_python(session_id)
+    session._state.adding = False
+    user.last_login = now
+    return session
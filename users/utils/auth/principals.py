@@ -0,0 +1,115 @@
+"""
+Versioned cache of the authenticated user ("principal"), keyed by user id.
+
+A snapshot holds only the columns authentication needs (id, email, is_active,
+is_superuser, timezone, token_epoch) plus the user's tenant ids, and is stamped
+with the user's current version. ``bump_version`` is called from the ``AuthUser`` and
+``UserOrganization`` signals; a snapshot whose stamp no longer matches the
+current version is never served, so a deactivated user cannot authenticate
+from a stale entry even if a concurrent request re-cached the old row.
+
+Versions live in the ``AUTH_CACHE`` alias when one is set. Without it, a bump
+only reaches the worker that made it, so snapshots are then kept for only
+``LOCAL_TTL`` seconds; that bounds how long another worker can serve them.
+"""
+
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+
+from users.models import UserOrganization
+from users.utils.cache.ttl import TTLCache, MISSING
+
+User = get_user_model()
+
+SNAPSHOT_FIELDS = ["id", "email", "is_active", "is_superuser", "timezone", "token_epoch"]
+
+principal_cache = TTLCache(
+    "principal",
+    ttl=settings.AUTH_CACHE["PRINCIPAL_TTL"],
+    alias=settings.AUTH_CACHE["ALIAS"],
+    local_ttl=settings.AUTH_CACHE["LOCAL_TTL"],
+    coherent=True,
+)
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f"principal-version:{user_id}"
+
+
+def get_version(user_id):
+    user_id = str(user_id)
+    shared = principal_cache.shared
+    if shared is not None:
+        return shared.get_or_set(_version_key(user_id), 0, None)
+    return _versions.get(user_id, 0)
+
+
+def bump_version(user_id):
+    """Invalidate every cached snapshot of the given user."""
+    user_id = str(user_id)
+    shared = principal_cache.shared
+    if shared is not None:
+        try:
+            shared.incr(_version_key(user_id))
+        except ValueError:
+            shared.set(_version_key(user_id), 1, None)
+    with _versions_lock:
+        _versions[user_id] = _versions.get(user_id, 0) + 1
+    principal_cache.delete(user_id)
+
+
+def load_snapshot(user_id):
+    """Read a fresh snapshot from the database, or None if the user is gone."""
+    version = get_version(user_id)
+    row = User.objects.filter(pk=user_id).values(*SNAPSHOT_FIELDS).first()
+    if row is None:
+        return None
+    row["tenants"] = [
+        str(tenant_id)
+        for tenant_id in UserOrganization.objects.filter(user_id=user_id).values_list(
+            "tenant_id", flat=True
+        )
+    ]
+    row["version"] = version
+    return row
+
+
+def get_snapshot(user_id):
+    user_id = str(user_id)
+    snapshot = principal_cache.get(user_id)
+    if snapshot is not MISSING and snapshot["version"] == get_version(user_id):
+        return snapshot
+
+    snapshot = load_snapshot(user_id)
+    if snapshot is not None:
+        principal_cache.set(user_id, snapshot)
+    return snapshot
+
+
+def get_principal(user_id):
+    """
+    Return an ``AuthUser`` built from the cached snapshot, or None if the user
+    does not exist. Columns outside the snapshot are deferred and load lazily.
+    """
+    try:
+        snapshot = get_snapshot(user_id)
+    except ValidationError:
+        return None
+    if snapshot is None:
+        return None
+
+    # from_db expects the loaded values in model field order.
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in snapshot]
+    user = User.from_db("default", fields, [snapshot[field] for field in fields])
+    user.tenant_ids = snapshot["tenants"]
+    return user
+
+
+def get_stats():
+    return principal_cache.stats()
@@ -0,0 +1,151 @@
+"""
+Session refresh with single-flight coalescing.
+
+Several browser tabs (or a retrying mobile client) tend to refresh the same
+session at the same moment. ``coalesced_refresh`` lets one of them do the work
+while concurrent callers in the same process wait for its result, and keeps
+that result for a short window so near-simultaneous callers in any worker
+(with a shared ``AUTH_CACHE`` alias) get the same tokens without another read
+or write. The kept results are dropped with the session's cache entry by
+``invalidate_sessions``, which logout and revocation go through.
+
+For mobile clients the window doubles as a grace period: a refresh token that
+was just rotated is still answered with the result of its rotation for
+``GRACE_PERIOD`` seconds, so a client that lost the race does not get logged out.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework import status
+
+from users.models import UserSession
+from users.utils.auth.claims import get_claims, apply_claims
+from users.utils.auth.sessions import invalidate_sessions, refresh_results
+from users.utils.auth.revocation import is_token_revoked, revoke_token
+from users.utils.auth.epoch import is_token_stale
+from users.utils.auth.tokens import RefreshToken
+from users.utils.cache.ttl import MISSING
+
+
+class RefreshFailed(Exception):
+    def __init__(self, error, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(error)
+        self.error = error
+        self.status_code = status_code
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+single_flight = SingleFlight()
+
+
+def refresh_session(session_id, refresh_token, is_mobile):
+    """
+    Mint a new access token for the session (and rotate the refresh token for
+    mobile clients). Returns a dict with ``access``, ``session_id`` and, for
+    mobile, ``refresh``; raises ``RefreshFailed`` otherwise.
+    """
+    try:
+        session = UserSession.objects.get(session_id=session_id)
+    except (UserSession.DoesNotExist, ValidationError):
+        raise RefreshFailed("Invalid session")
+
+    if session.is_expired:
+        raise RefreshFailed("Session expired", status.HTTP_401_UNAUTHORIZED)
+    if is_mobile and session.refresh_token != refresh_token:
+        raise RefreshFailed("Invalid refresh token for mobile")
+    if not session.refresh_token:
+        raise RefreshFailed("Session refresh token is missing")
+
+    try:
+        refresh = RefreshToken(session.refresh_token)
+    except Exception as e:
+        raise RefreshFailed(f"Invalid refresh token: {str(e)}")
+    claims = get_claims(session.user_id) or {}
+    if is_token_revoked(refresh.payload) or is_token_stale(
+        refresh.payload, claims.get("token_epoch", 0)
+    ):
+        raise RefreshFailed("Refresh token has been revoked", status.HTTP_401_UNAUTHORIZED)
+
+    result = {"session_id": str(session.session_id)}
+
+    # Rotate refresh token if mobile
+    if is_mobile:
+        revoke_token(RefreshToken(session.refresh_token))
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        result["refresh"] = str(refresh)
+        UserSession.objects.filter(pk=session.pk).update(
+            refresh_token=result["refresh"],
+            expires_at=timezone.now() + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"],
+        )
+        invalidate_sessions([session.session_id])
+
+    # Stamp the access token with the user's current claims document
+    result["access"] = str(apply_claims(refresh.access_token, claims))
+    return result
+
+
+def coalesced_refresh(session_id, refresh_token, is_mobile):
+    """``refresh_session`` shared by concurrent callers presenting the same credentials."""
+    presented = (
+        hashlib.sha256((refresh_token or "").encode()).hexdigest()[:32]
+        if is_mobile
+        else "web"
+    )
+    window = (
+        settings.TOKEN_REFRESH["GRACE_PERIOD"]
+        if is_mobile
+        else settings.TOKEN_REFRESH["COALESCE_WINDOW"]
+    )
+
+    def recent():
+        return refresh_results.get(session_id, {}).get(presented, MISSING)
+
+    def run():
+        result = recent()
+        if result is MISSING:
+            result = refresh_session(session_id, refresh_token, is_mobile)
+            # refresh_session may have invalidated the session (rotation), so
+            # merge into whatever is left for it now.
+            results = refresh_results.get(session_id, {})
+            refresh_results.set(session_id, {**results, presented: result}, ttl=window)
+        return result
+
+    result = recent()
+    if result is not MISSING:
+        return result
+    return single_flight.do(f"{session_id}:{presented}", run)
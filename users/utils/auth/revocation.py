@@ -0,0 +1,145 @@
+"""
+Revoked token ids (``jti``), checked in memory on every authenticated request.
+
+Each worker keeps the set of revoked, not-yet-expired jtis in two layers: a
+Bloom filter that answers the common "not revoked" case with a few bit probes,
+and an exact ``jti -> exp`` dict behind it that settles Bloom hits. Entries are
+dropped once the token's own ``exp`` has passed, so memory is bounded by the
+number of live revoked tokens.
+
+``RevokedToken`` rows are the shared source of truth: ``revoke`` writes one,
+and every worker pulls rows created since its last sync at most once per
+``SYNC_INTERVAL`` seconds, so a revocation reaches other workers within that
+interval (and the revoking worker immediately).
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import RevokedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class RevocationStore:
+    def __init__(self, capacity, error_rate, sync_interval, sync_overlap=5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self._lock = threading.Lock()
+        self._next_sync = 0.0
+        self._next_sweep = 0.0
+        self._watermark = None
+        self._reset({})
+
+    def _reset(self, entries):
+        capacity = self.capacity
+        while len(entries) > capacity // 2:
+            capacity *= 2
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti in entries:
+            bloom.add(jti)
+        self._entries, self._bloom = entries, bloom
+
+    def _add(self, jti, exp):
+        if exp <= time.time():
+            return
+        self._entries[jti] = exp
+        if len(self._entries) > self._bloom.capacity:
+            self._reset(self._entries)
+        else:
+            self._bloom.add(jti)
+
+    def sweep(self):
+        """Forget tokens that have expired on their own and shrink the filter."""
+        with self._lock:
+            self._next_sweep = time.monotonic() + 60
+            now = time.time()
+            live = {jti: exp for jti, exp in self._entries.items() if exp > now}
+            if len(live) != len(self._entries):
+                self._reset(live)
+
+    def sync(self, force=False):
+        if not force and time.monotonic() < self._next_sync:
+            return
+        with self._lock:
+            self._next_sync = time.monotonic() + self.sync_interval
+            rows = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+            if self._watermark is not None:
+                rows = rows.filter(created_at__gte=self._watermark - self.sync_overlap)
+            for jti, expires_at, created_at in rows.values_list(
+                "jti", "expires_at", "created_at"
+            ):
+                self._add(jti, expires_at.timestamp())
+                if self._watermark is None or created_at > self._watermark:
+                    self._watermark = created_at
+        if time.monotonic() >= self._next_sweep:
+            self.sweep()
+
+    def revoke(self, jti, exp):
+        """Revoke ``jti`` until ``exp`` (epoch seconds) in every worker."""
+        with self._lock:
+            self._add(jti, exp)
+        RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={"expires_at": datetime.fromtimestamp(exp, tz=dt_timezone.utc)},
+        )
+
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._bloom:
+            return False
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+revocation_store = RevocationStore(
+    capacity=settings.TOKEN_REVOCATION["CAPACITY"],
+    error_rate=settings.TOKEN_REVOCATION["ERROR_RATE"],
+    sync_interval=settings.TOKEN_REVOCATION["SYNC_INTERVAL"],
+)
+
+
+def revoke_token(token):
+    """Revoke a decoded simplejwt token until it expires."""
+    jti = token.payload.get(api_settings.JTI_CLAIM)
+    if jti:
+        revocation_store.revoke(jti, token.payload["exp"])
+
+
+def is_token_revoked(payload):
+    jti = payload.get(api_settings.JTI_CLAIM)
+    return bool(jti) and revocation_store.is_revoked(jti)
@@ -0,0 +1,78 @@
+"""
+Read-through cache of session validity, keyed by ``session_id``.
+
+Only the expiry and the owning user id are cached; unknown session ids are
+cached as ``None`` (session ids are random UUIDs and are never reused). Any code
+that deletes a ``UserSession`` or changes its ``expires_at`` must call
+``invalidate_sessions`` so the next request reads the row again.
+
+``invalidate_sessions`` also drops the session's recent refresh results (see
+``users.utils.auth.refresh``), so a logout or revocation is not undone by a
+coalesced refresh answered from that window.
+"""
+
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from users.models import UserSession
+from users.utils.cache.ttl import TTLCache, MISSING
+
+
+class CachedSession(namedtuple("CachedSession", ["session_id", "user_id", "expires_at"])):
+    __slots__ = ()
+
+    @property
+    def is_expired(self):
+        """Returns True if the session is expired, False otherwise."""
+        return timezone.now() >= self.expires_at
+
+
+session_cache = TTLCache(
+    "session",
+    ttl=settings.AUTH_CACHE["SESSION_TTL"],
+    alias=settings.AUTH_CACHE["ALIAS"],
+    local_ttl=settings.AUTH_CACHE["LOCAL_TTL"],
+)
+
+# {presented credential: refresh result} per session, for ``coalesced_refresh``.
+# Kept for the whole grace period; ``invalidate_sessions`` drops them early.
+refresh_results = TTLCache(
+    "refresh",
+    ttl=settings.TOKEN_REFRESH["GRACE_PERIOD"],
+    alias=settings.AUTH_CACHE["ALIAS"],
+    local_ttl=settings.AUTH_CACHE["LOCAL_TTL"],
+)
+
+
+def get_session(session_id):
+    """
+    Return a ``CachedSession`` for ``session_id`` or None if it does not exist.
+    Raises ValueError for a malformed session id.
+    """
+    session_id = str(uuid.UUID(str(session_id)))
+    cached = session_cache.get(session_id)
+    if cached is not MISSING:
+        return cached
+
+    row = (
+        UserSession.objects.filter(session_id=session_id)
+        .values_list("user_id", "expires_at")
+        .first()
+    )
+    session = CachedSession(session_id, str(row[0]), row[1]) if row else None
+
+    ttl = session_cache.ttl
+    if session:
+        # Never keep a session around past its own expiry.
+        ttl = min(ttl, (session.expires_at - timezone.now()).total_seconds())
+    session_cache.set(session_id, session, ttl=ttl)
+    return session
+
+
+def invalidate_sessions(session_ids):
+    session_ids = [str(session_id) for session_id in session_ids]
+    session_cache.delete_many(session_ids)
+    refresh_results.delete_many(session_ids)
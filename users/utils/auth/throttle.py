@@ -0,0 +1,145 @@
+"""
+Sliding-window login throttling.
+
+Each limiter approximates a sliding window with two fixed buckets: the count
+of the current bucket plus the previous bucket's count weighted by how much of
+it still overlaps the window. That needs two integers per key, so rejecting an
+attempt is a dictionary lookup (or one ``get_many`` on the shared backend) and
+never reaches the password hasher.
+
+``LoginThrottle`` applies one limiter per client IP and one per normalized
+login identifier; DRF runs it before the view parses credentials.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from users.utils.auth.identifiers import normalize_identifier
+from users.utils.location.client import get_client_ip
+
+
+class SlidingWindowLimiter:
+    def __init__(self, prefix, limit, window, alias=None, maxsize=100000):
+        self.prefix = prefix
+        self.limit = limit
+        self.window = window
+        self.alias = alias
+        self.maxsize = maxsize
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _key(self, key):
+        return hashlib.sha1(str(key).encode()).hexdigest()
+
+    def _estimate(self, previous, current, now):
+        overlap = 1 - (now % self.window) / self.window
+        return previous * overlap + current
+
+    def _retry_after(self, now):
+        return math.ceil(self.window - now % self.window)
+
+    def _counts_local(self, key, bucket):
+        start, previous, current = self._counts.get(key, (bucket, 0, 0))
+        if start == bucket - 1:
+            return bucket, current, 0
+        if start != bucket:
+            return bucket, 0, 0
+        return bucket, previous, current
+
+    def hit(self, key):
+        """
+        Record an attempt for ``key``. Returns ``(True, 0)`` if it is within the
+        budget, or ``(False, retry_after)`` (not recorded) if it is not.
+        """
+        now = time.time()
+        bucket = int(now // self.window)
+        key = self._key(key)
+
+        shared = self.shared
+        if shared is not None:
+            current_key = f"{self.prefix}:{key}:{bucket}"
+            counts = shared.get_many([f"{self.prefix}:{key}:{bucket - 1}", current_key])
+            previous = counts.get(f"{self.prefix}:{key}:{bucket - 1}", 0)
+            if self._estimate(previous, counts.get(current_key, 0), now) >= self.limit:
+                return False, self._retry_after(now)
+            shared.add(current_key, 0, self.window * 2)
+            shared.incr(current_key)
+            return True, 0
+
+        with self._lock:
+            bucket, previous, current = self._counts_local(key, bucket)
+            if self._estimate(previous, current, now) >= self.limit:
+                return False, self._retry_after(now)
+            self._counts[key] = (bucket, previous, current + 1)
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+        return True, 0
+
+    def reset(self, key):
+        key = self._key(key)
+        shared = self.shared
+        if shared is not None:
+            bucket = int(time.time() // self.window)
+            shared.delete_many(
+                [f"{self.prefix}:{key}:{bucket - 1}", f"{self.prefix}:{key}:{bucket}"]
+            )
+        with self._lock:
+            self._counts.pop(key, None)
+
+    def clear(self):
+        """Drop the local counts (the shared backend is left untouched)."""
+        with self._lock:
+            self._counts.clear()
+
+
+login_ip_limiter = SlidingWindowLimiter(
+    "login-ip",
+    limit=settings.LOGIN_THROTTLE["IP_LIMIT"],
+    window=settings.LOGIN_THROTTLE["IP_WINDOW"],
+    alias=settings.AUTH_CACHE["ALIAS"],
+)
+login_identifier_limiter = SlidingWindowLimiter(
+    "login-identifier",
+    limit=settings.LOGIN_THROTTLE["IDENTIFIER_LIMIT"],
+    window=settings.LOGIN_THROTTLE["IDENTIFIER_WINDOW"],
+    alias=settings.AUTH_CACHE["ALIAS"],
+)
+
+
+def login_identifier(request):
+    """The throttling key for the identifier in a login request."""
+    value = request.data.get("email_or_phone")
+    if not isinstance(value, str):
+        return None
+    return normalize_identifier(value) or value.strip().lower()
+
+
+class LoginThrottle(BaseThrottle):
+    """Per-IP and per-identifier login budget, checked before any hashing."""
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        ip_address = getattr(request, "ip_address", None) or get_client_ip(request)
+        allowed, self.retry_after = login_ip_limiter.hit(ip_address)
+        if not allowed:
+            return False
+
+        identifier = login_identifier(request)
+        if identifier:
+            allowed, self.retry_after = login_identifier_limiter.hit(identifier)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
@@ -44,40 +44,21 @@ Example Usage:
     print(str(token))  # Outputs the generated JWT as a string.
 """
 
-from rest_framework_simplejwt.tokens import RefreshToken
-from users.models import UserSettings
+from users.utils.auth.tokens import RefreshToken
+from users.utils.auth.claims import get_claims, store_claims, apply_claims
 
 
-def get_user_settings(user):
+def generate_token_payload(user, claims=None):
     """
-    Retrieve the appropriate UserSettings for the given user.
-    If the user belongs to an organization, return the organization's settings.
-    Otherwise, return the user's personal settings.
+    Mint a refresh token carrying the user's cached claims document. `claims`
+    may be a freshly loaded document (e.g. from the login query); it replaces
+    the cached one.
     """
-    if user:
-        settings = UserSettings.objects.filter(user=user).first()
-    else:
-        settings = UserSettings.objects.filter(user=user).first()
-    return settings or UserSettings.objects.create(user=user)
-
-
-def generate_token_payload(user):
     refresh = RefreshToken.for_user(user)
-    settings = get_user_settings(user)
-    organizations = user.organizations.all()
+    if claims is None:
+        claims = get_claims(user.pk)
+    else:
+        store_claims(user.pk, claims)
 
-    refresh["email"] = user.email
-    # refresh["first_name"] = user.first_name
-    # refresh["last_name"] = user.last_name
-    # refresh["profile_picture"] = user.profile_picture
-    refresh["language"] = settings.language if settings else user.language
-    refresh["timezone"] = user.timezone
-    # refresh["is_verified"] = user.is_verified
-    # refresh["last_login"] = user.last_login.isoformat() if user.last_login else None
-    # refresh["is_active"] = user.is_active
-    refresh["is_superuser"] = user.is_superuser
-    refresh["tenants"] = [
-        str(tenant_id)
-        for tenant_id in organizations.values_list("tenant_id", flat=True)
-    ]
-    return refresh
+    # Claims: email, language, timezone, is_superuser, token_epoch, tenants
+    return apply_claims(refresh, claims)
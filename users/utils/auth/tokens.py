@@ -0,0 +1,22 @@
+"""
+SimpleJWT token classes signed through the key ring in ``keys.py``.
+
+Use these instead of ``rest_framework_simplejwt.tokens`` so that every token we
+mint or read goes through ``KeyRingTokenBackend``.
+"""
+
+from rest_framework_simplejwt import tokens
+
+from .keys import get_token_backend
+
+
+class AccessToken(tokens.AccessToken):
+    def get_token_backend(self):
+        return get_token_backend()
+
+
+class RefreshToken(tokens.RefreshToken):
+    access_token_class = AccessToken
+
+    def get_token_backend(self):
+        return get_token_backend()
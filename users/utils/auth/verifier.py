@@ -0,0 +1,84 @@
+"""
+Local verification of our access tokens for peer services.
+
+This module only depends on ``requests`` and ``PyJWT[crypto]`` so other services
+can vendor it. Keys are fetched from ``/api/auth/.well-known/jwks.json`` and held
+in memory; an unknown ``kid`` (i.e. a freshly rotated key) triggers a refetch,
+rate-limited by ``min_refresh_interval`` so garbage tokens cannot hammer us.
+
+Example Usage:
+    verifier = JWKSVerifier("http://user-api:8000/api/auth/.well-known/jwks.json")
+    claims = verifier.verify(request.COOKIES["cc_access"])
+"""
+
+import threading
+import time
+
+import jwt
+import requests
+
+
+class JWKSVerifier:
+    def __init__(
+        self,
+        jwks_url,
+        ttl=300,
+        min_refresh_interval=10,
+        timeout=2,
+        audience=None,
+        issuer=None,
+        leeway=0,
+    ):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self._keys = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """Refetch the key set if it is stale (or ``force`` and not rate-limited)."""
+        with self._lock:
+            if self._fetched_at is not None:
+                age = time.monotonic() - self._fetched_at
+                if age < self.min_refresh_interval or (not force and age < self.ttl):
+                    return
+            response = requests.get(self.jwks_url, timeout=self.timeout)
+            response.raise_for_status()
+            self._keys = {
+                jwk["kid"]: jwt.PyJWK(jwk) for jwk in response.json().get("keys", [])
+            }
+            self._fetched_at = time.monotonic()
+
+    def get_key(self, kid):
+        self.refresh()
+        if kid not in self._keys:
+            self.refresh(force=True)
+        return self._keys.get(kid)
+
+    def verify(self, token, token_type="access"):
+        """
+        Return the claims of a valid token. Raises ``jwt.InvalidTokenError`` if
+        the signature, expiry or token type does not check out.
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.get_key(kid)
+        if key is None:
+            raise jwt.InvalidKeyError(f"Unknown signing key: {kid}")
+
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name],
+            audience=self.audience,
+            issuer=self.issuer,
+            leeway=self.leeway,
+            options={"verify_aud": self.audience is not None},
+        )
+        if token_type and claims.get("token_type") != token_type:
+            raise jwt.InvalidTokenError("Unexpected token type")
+        return claims
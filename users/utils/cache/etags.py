@@ -0,0 +1,84 @@
+"""
+Strong ETags for per-user resources (profile, settings, tenant memberships).
+
+A resource's ETag is a digest of the user's ``data_version``, the row's
+``updated_at`` where it has one, and the query string (which selects the
+representation, e.g. ``?fields=``). ``data_version`` is replaced on every
+write to the user, their settings or their memberships: the ``AuthUser``
+save itself sets a new one, and the model signals (or, for writes that skip
+them, the writer) call ``bump_versions``. A new random value rather than an
+increment means a stale instance saved over a newer row can never bring an
+old ETag back.
+
+Reading the validators is a single-row query on the primary key; the row is
+only loaded and serialized when the client's ETag does not match.
+"""
+
+import hashlib
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
+from rest_framework.response import Response
+
+User = get_user_model()
+
+PROFILE = "profile"
+SETTINGS = "settings"
+TENANTS = "tenants"
+
+
+def bump_versions(user_ids):
+    """Give every resource of the users a new ETag; returns the new version."""
+    version = uuid.uuid4()
+    User.objects.filter(pk__in=list(user_ids)).update(data_version=version)
+    return version
+
+
+def user_version(user_id):
+    return User.objects.values_list("data_version", flat=True).get(pk=user_id)
+
+
+def make_etag(resource, user_id, version, last_modified=None, variant=""):
+    key = f"{resource}:{user_id}:{version}:{last_modified}:{variant}"
+    return f'"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def _set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def conditional_get(request, resource, user_id, validators, build):
+    """
+    Respond to a GET of ``resource`` for ``user_id``. ``validators()`` returns
+    ``(version, last_modified)`` with ``last_modified`` as a timestamp or None;
+    ``build()`` returns the data and is only called when the client's copy is
+    out of date.
+    """
+    version, last_modified = validators()
+    variant = urlencode(sorted(request.GET.lists()), doseq=True)
+    etag = make_etag(resource, user_id, version, last_modified, variant)
+    not_modified = get_conditional_response(request, etag, last_modified)
+    if not_modified is not None:
+        return _set_validators(not_modified, etag, last_modified)
+    return _set_validators(Response(build()), etag, last_modified)
+
+
+def check_preconditions(request, resource, user_id, version, last_modified=None):
+    """
+    For a write: None if ``If-Match``/``If-Unmodified-Since`` hold for the
+    current (full) representation, otherwise the 412 response. Call it with
+    the row locked so the check and the update are atomic.
+    """
+    etag = make_etag(resource, user_id, version, last_modified)
+    return get_conditional_response(request, etag, last_modified)
+
+
+def with_etag(response, resource, user_id, version, last_modified=None):
+    """Stamp a write response with the validators of its (new) representation."""
+    etag = make_etag(resource, user_id, version, last_modified)
+    return _set_validators(response, etag, last_modified)
@@ -0,0 +1,105 @@
+"""
+A small TTL cache used on the authentication hot path.
+
+Entries always live in a per-process dictionary. When an ``alias`` naming one of
+the Django ``CACHES`` is given, the same entries are also written to that shared
+backend so that other workers can read them and see deletes. In that mode the
+local copy is only trusted for ``local_ttl`` seconds, which bounds how long a
+worker can serve an entry that another worker has already invalidated.
+
+Without an alias, deletes never leave the process. Caches created with
+``coherent=True`` (those whose invalidation is a security boundary) then keep
+entries for at most ``local_ttl`` seconds.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(
+        self, prefix, ttl, maxsize=10000, alias=None, local_ttl=None, coherent=False
+    ):
+        if coherent and not alias and local_ttl is not None:
+            ttl = min(ttl, local_ttl)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.alias = alias
+        self.local_ttl = ttl if local_ttl is None or not alias else min(local_ttl, ttl)
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _store_local(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, key, default=MISSING):
+        """Return the cached value for ``key`` or ``default`` when absent/expired."""
+        key = str(key)
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                if item[0] > time.monotonic():
+                    self.hits += 1
+                    return item[1]
+                del self._data[key]
+
+        if self.shared is not None:
+            value = self.shared.get(self._key(key), MISSING)
+            if value is not MISSING:
+                self._store_local(key, value, self.local_ttl)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        key = str(key)
+        self._store_local(key, value, min(ttl, self.local_ttl))
+        if self.shared is not None:
+            self.shared.set(self._key(key), value, ttl)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        keys = [str(key) for key in keys]
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete_many([self._key(key) for key in keys])
+
+    def clear(self):
+        """Drop the local entries (the shared backend is left untouched)."""
+        with self._lock:
+            self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
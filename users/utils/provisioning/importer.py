@@ -0,0 +1,284 @@
+"""
+Bulk import of a legacy user base, used by the ``import_users`` command.
+
+Input rows are read lazily from CSV or NDJSON and handled in chunks. Each
+chunk's passwords are hashed in the provisioning hashing pool, then the chunk is merged in
+one transaction. On PostgreSQL the chunk is streamed into a temporary staging
+table with ``COPY`` and merged into ``Users``, ``Settings``,
+``LoginIdentifiers`` and ``UserOrganizations`` with one ``INSERT ... SELECT``
+each. Users whose email or phone number is already taken are skipped. Other
+databases fall back to ``bulk_create`` through ``insert_users``.
+"""
+
+import csv
+import io
+import json
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from users.models import LoginIdentifier, UserOrganization, UserSettings
+from users.utils.auth.hashing import provisioning_hashing_service
+from users.utils.auth.identifiers import identifiers_for
+from users.utils.provisioning.users import insert_users, taken_identifiers
+from users.utils.tenants.members import adjust_member_counts
+
+User = get_user_model()
+
+STAGE_COLUMNS = [
+    ("id", "uuid"),
+    ("username", "text"),
+    ("email", "text"),
+    ("phone_number", "text"),
+    ("first_name", "text"),
+    ("last_name", "text"),
+    ("password", "text"),
+    ("tenant_id", "uuid"),
+    ("settings_id", "uuid"),
+    ("membership_id", "uuid"),
+    ("email_identifier_id", "uuid"),
+    ("email_identifier", "text"),
+    ("phone_identifier_id", "uuid"),
+    ("phone_identifier", "text"),
+]
+
+TEXT_COLUMNS = (
+    "email",
+    "phone_number",
+    "first_name",
+    "last_name",
+    "password",
+    "password_hash",
+    "tenant_id",
+)
+
+
+def read_rows(path, fmt):
+    """
+    Yield each input row: a dict of strings for CSV, any JSON value for
+    NDJSON. A line that is not valid JSON is yielded as None, so ``prepare``
+    counts it as invalid and the row count stays in step with the checkpoint.
+    """
+    with open(path, newline="") as source:
+        if fmt == "csv":
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield None
+
+
+class ImportRow:
+    """A validated input row: the unsaved user, its tenant and login identifiers."""
+
+    def __init__(self, user, tenant_id, identifiers, password=None):
+        self.user = user
+        self.tenant_id = tenant_id
+        self.identifiers = identifiers
+        self.password = password
+
+
+def _is_text(row):
+    return isinstance(row, dict) and all(
+        isinstance(row.get(name), (str, type(None))) for name in TEXT_COLUMNS
+    )
+
+
+def _fits(user):
+    return all(
+        len(getattr(user, name) or "") <= User._meta.get_field(name).max_length
+        for name in ("email", "phone_number", "first_name", "last_name")
+    )
+
+
+def prepare(rows, default_tenant=None):
+    """
+    Turn raw input rows into ``ImportRow``s. Returns ``(prepared, invalid)``;
+    rows that are not objects of strings, rows without an email, with values
+    too long for their column or repeating an identifier seen earlier in the
+    chunk count as invalid.
+
+    ``password`` columns hold plain text and are hashed in the pool;
+    ``password_hash`` columns hold hashes Django can verify and are kept.
+    """
+    prepared, seen, invalid = [], set(), 0
+    for row in rows:
+        if not _is_text(row):
+            invalid += 1
+            continue
+        email = (row.get("email") or "").strip()
+        phone_number = (row.get("phone_number") or "").strip() or None
+        identifiers = identifiers_for(email, phone_number)
+        if LoginIdentifier.EMAIL not in identifiers or seen & set(identifiers.values()):
+            invalid += 1
+            continue
+        try:
+            tenant_id = row.get("tenant_id") or default_tenant
+            tenant_id = tenant_id and uuid.UUID(str(tenant_id))
+        except ValueError:
+            invalid += 1
+            continue
+        user = User(
+            username=email,
+            email=email,
+            phone_number=phone_number,
+            first_name=row.get("first_name") or "",
+            last_name=row.get("last_name") or "",
+            password=row.get("password_hash") or "",
+        )
+        if not _fits(user):
+            invalid += 1
+            continue
+        seen.update(identifiers.values())
+        prepared.append(ImportRow(user, tenant_id, identifiers, row.get("password")))
+
+    plain = [row for row in prepared if row.password and not row.user.password]
+    for row, encoded in zip(
+        plain, provisioning_hashing_service.make_passwords(row.password for row in plain)
+    ):
+        row.user.password = encoded
+    for row in prepared:
+        if not row.user.password:
+            row.user.password = make_password(None)
+    return prepared, invalid
+
+
+def _copy_buffer(prepared):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in prepared:
+        user = row.user
+        writer.writerow(
+            [
+                user.pk,
+                user.username,
+                user.email,
+                user.phone_number,
+                user.first_name,
+                user.last_name,
+                user.password,
+                row.tenant_id,
+                uuid.uuid4(),
+                uuid.uuid4(),
+                uuid.uuid4(),
+                row.identifiers[LoginIdentifier.EMAIL],
+                uuid.uuid4(),
+                row.identifiers.get(LoginIdentifier.PHONE),
+            ]
+        )
+    buffer.seek(0)
+    return buffer
+
+
+def _insert_select(model, sources):
+    """
+    ``INSERT INTO <model> (...) SELECT ... FROM stage`` with every column
+    either taken from ``sources`` (column -> SQL) or set to its model default.
+    """
+    quote = connection.ops.quote_name
+    columns, values, params = [], [], []
+    for field in model._meta.concrete_fields:
+        columns.append(quote(field.column))
+        if field.column in sources:
+            values.append(sources[field.column])
+        elif getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+            values.append("now()")
+        else:
+            values.append("%s")
+            params.append(field.get_db_prep_save(field.get_default(), connection))
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(columns)}) "
+        f"SELECT {', '.join(values)} FROM import_users_stage"
+    )
+    return sql, params
+
+
+def copy_merge(prepared):
+    """Merge ``prepared`` through a COPY-loaded staging table; returns users created."""
+    quote = connection.ops.quote_name
+    identifiers = quote(LoginIdentifier._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE import_users_stage ("
+            + ", ".join(f"{name} {kind}" for name, kind in STAGE_COLUMNS)
+            + ") ON COMMIT DROP"
+        )
+        # Empty fields are NULL in COPY's csv format; names may legitimately be "".
+        cursor.copy_expert(
+            "COPY import_users_stage FROM STDIN WITH (FORMAT csv, "
+            "FORCE_NOT_NULL (username, email, first_name, last_name, password))",
+            _copy_buffer(prepared),
+        )
+
+        users_sql, params = _insert_select(
+            User,
+            {
+                "id": "id",
+                "username": "username",
+                "email": "email",
+                "phone_number": "phone_number",
+                "first_name": "first_name",
+                "last_name": "last_name",
+                "password": "password",
+                "date_joined": "now()",
+            },
+        )
+        # Keep only the rows that were actually inserted in the staging table.
+        cursor.execute(
+            f"WITH inserted AS ({users_sql} AS stage WHERE NOT EXISTS ("
+            f"SELECT 1 FROM {identifiers} AS identifier WHERE identifier.value IN "
+            f"(stage.email_identifier, stage.phone_identifier)) "
+            f"ON CONFLICT DO NOTHING RETURNING id) "
+            f"DELETE FROM import_users_stage WHERE id NOT IN (SELECT id FROM inserted)",
+            params,
+        )
+        cursor.execute("SELECT count(*) FROM import_users_stage")
+        created = cursor.fetchone()[0]
+
+        cursor.execute(*_insert_select(UserSettings, {"id": "settings_id", "user_id": "id"}))
+        for kind in (LoginIdentifier.EMAIL, LoginIdentifier.PHONE):
+            sql, params = _insert_select(
+                LoginIdentifier,
+                {
+                    "id": f"{kind}_identifier_id",
+                    "user_id": "id",
+                    "kind": f"'{kind}'",
+                    "value": f"{kind}_identifier",
+                },
+            )
+            cursor.execute(
+                f"{sql} WHERE {kind}_identifier IS NOT NULL ON CONFLICT DO NOTHING", params
+            )
+        sql, params = _insert_select(
+            UserOrganization, {"id": "membership_id", "user_id": "id", "tenant_id": "tenant_id"}
+        )
+        cursor.execute(f"{sql} WHERE tenant_id IS NOT NULL", params)
+        cursor.execute(
+            "SELECT tenant_id, count(*) FROM import_users_stage "
+            "WHERE tenant_id IS NOT NULL GROUP BY tenant_id"
+        )
+        adjust_member_counts(dict(cursor.fetchall()))
+    return created
+
+
+def orm_merge(prepared):
+    """``copy_merge`` for databases without COPY; returns users created."""
+    taken = taken_identifiers(
+        [value for row in prepared for value in row.identifiers.values()]
+    )
+    prepared = [row for row in prepared if not taken & set(row.identifiers.values())]
+    insert_users([row.user for row in prepared], [row.tenant_id for row in prepared])
+    return len(prepared)
+
+
+def merge(prepared):
+    if not prepared:
+        return 0
+    if connection.vendor == "postgresql":
+        return copy_merge(prepared)
+    return orm_merge(prepared)
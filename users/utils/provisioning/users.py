@@ -0,0 +1,166 @@
+"""
+Bulk user provisioning.
+
+``provision_users`` creates thousands of users per call with a fixed number of
+round trips: set-based queries find identifiers (and raw ``email``,
+``username`` or ``phone_number`` values of users without identifiers) already
+taken, passwords
+are hashed in the provisioning hashing pool, and users, their settings, login
+identifiers and tenant memberships are written with ``bulk_create`` in
+batches. ``bulk_create`` bypasses ``post_save``, so the rows those signals
+would have created (and the tenant member counts they would have adjusted)
+are written here explicitly. A batch that still hits a unique constraint
+(another writer got there first) is retried one row at a time, so only the
+conflicting rows fail.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from users.models import LoginIdentifier, UserOrganization, UserSettings
+from users.utils.auth.hashing import provisioning_hashing_service
+from users.utils.auth.identifiers import make_identifiers
+from users.utils.tenants.members import adjust_member_counts
+
+User = get_user_model()
+
+
+def taken_identifiers(values):
+    """The subset of normalized identifier ``values`` that already belong to a user."""
+    return set(LoginIdentifier.objects.filter(value__in=values).values_list("value", flat=True))
+
+
+def _taken_columns(rows):
+    """
+    Raw ``email`` and ``phone_number`` values of ``rows`` already stored on a
+    user, including users created before login identifiers existed.
+    """
+    emails = [row["email"] for row in rows.values() if row.get("email")]
+    phones = [row["phone_number"] for row in rows.values() if row.get("phone_number")]
+    taken = {"email": set(), "phone_number": set()}
+    for email, username, phone_number in User.objects.filter(
+        Q(email__in=emails) | Q(username__in=emails) | Q(phone_number__in=phones)
+    ).values_list("email", "username", "phone_number"):
+        taken["email"].update((email, username))
+        taken["phone_number"].add(phone_number)
+    return taken
+
+
+def _taken_rows(rows):
+    """``{index: errors}`` for rows whose email or phone is taken or repeated."""
+    identifiers = {
+        index: make_identifiers(None, row.get("email"), row.get("phone_number"))
+        for index, row in rows.items()
+    }
+    taken = taken_identifiers(
+        [identifier.value for found in identifiers.values() for identifier in found]
+    )
+
+    errors = {}
+    for field, values in _taken_columns(rows).items():
+        for index, row in rows.items():
+            if row.get(field) and row[field] in values:
+                errors.setdefault(index, {})[field] = f"A user with this {field} already exists."
+
+    seen = set()
+    for index, found in identifiers.items():
+        for identifier in found:
+            field = "email" if identifier.kind == LoginIdentifier.EMAIL else "phone_number"
+            if identifier.value in taken:
+                errors.setdefault(index, {})[field] = f"A user with this {field} already exists."
+            elif identifier.value in seen:
+                errors.setdefault(index, {})[field] = f"Duplicate {field} in this request."
+        seen.update(identifier.value for identifier in found)
+    return errors
+
+
+def insert_users(users, tenant_ids):
+    """
+    Insert unsaved ``users`` with their settings and login identifiers, and a
+    membership in ``tenant_ids[i]`` (if not None) for ``users[i]``.
+    """
+    identifiers = [
+        identifier
+        for user in users
+        for identifier in make_identifiers(user.pk, user.email, user.phone_number)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        UserSettings.objects.bulk_create([UserSettings(user_id=user.pk) for user in users])
+        LoginIdentifier.objects.bulk_create(identifiers)
+        UserOrganization.objects.bulk_create(
+            [
+                UserOrganization(user_id=user.pk, tenant_id=tenant_id)
+                for user, tenant_id in zip(users, tenant_ids)
+                if tenant_id
+            ]
+        )
+        adjust_member_counts(Counter(tenant_id for tenant_id in tenant_ids if tenant_id))
+
+
+def provision_users(rows, tenant_id=None, batch_size=None):
+    """
+    Create a user for each validated row (``email``, ``first_name``,
+    ``last_name`` and optionally ``phone_number``, ``password``) and add them to
+    ``tenant_id``. Returns one result dict per row, in order.
+    """
+    batch_size = batch_size or settings.BULK_PROVISIONING["BATCH_SIZE"]
+    results = [None] * len(rows)
+    pending = dict(enumerate(rows))
+    for index, errors in _taken_rows(pending).items():
+        results[index] = {"index": index, "status": "error", "errors": errors}
+        del pending[index]
+
+    # Rows without a password get an unusable one, which needs no hashing.
+    with_password = [index for index, row in pending.items() if row.get("password")]
+    hashes = dict(
+        zip(
+            with_password,
+            provisioning_hashing_service.make_passwords(
+                pending[index]["password"] for index in with_password
+            ),
+        )
+    )
+
+    users = [
+        (
+            index,
+            User(
+                username=row["email"],
+                email=row["email"],
+                phone_number=row.get("phone_number") or None,
+                first_name=row["first_name"],
+                last_name=row["last_name"],
+                password=hashes.get(index) or make_password(None),
+            ),
+        )
+        for index, row in pending.items()
+    ]
+    for start in range(0, len(users), batch_size):
+        batch = users[start : start + batch_size]
+        try:
+            insert_users([user for _, user in batch], [tenant_id] * len(batch))
+        except IntegrityError:
+            # Another writer took one of the identifiers since they were
+            # checked; retry the batch row by row so only that row fails.
+            inserted = []
+            for index, user in batch:
+                try:
+                    insert_users([user], [tenant_id])
+                except IntegrityError:
+                    results[index] = {
+                        "index": index,
+                        "status": "error",
+                        "errors": {"non_field_errors": "Conflicting user created concurrently."},
+                    }
+                else:
+                    inserted.append((index, user))
+            batch = inserted
+        for index, user in batch:
+            results[index] = {"index": index, "status": "created", "id": str(user.pk)}
+    return results
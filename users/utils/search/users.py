@@ -0,0 +1,107 @@
+"""
+User search for admin typeahead.
+
+Users are matched on their lowercased email, username and full name. On
+PostgreSQL each of those expressions has a ``pg_trgm`` GIN index (created by
+``create_search_indexes`` after migrate), which serves both ``LIKE 'abc%'``
+(prefix mode) and ``LIKE '%abc%'`` (contains mode) without a table scan, and
+matches are ranked by trigram similarity. Other databases run the same filter
+and rank in Python with pg_trgm's similarity formula.
+"""
+
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Greatest, Lower
+
+User = get_user_model()
+
+CONTAINS = "contains"
+PREFIX = "prefix"
+
+# Shorter substrings have no complete trigram, so the index cannot serve them.
+CONTAINS_MIN_LENGTH = 3
+
+SEARCH_FIELDS = {
+    "email": Lower("email"),
+    "username": Lower("username"),
+    "full_name": Lower(Concat("first_name", Value(" "), "last_name")),
+}
+
+RESULT_FIELDS = ["id", "email", "username", "first_name", "last_name"]
+
+
+def search_indexes():
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+
+    return [
+        GinIndex(OpClass(expression, name="gin_trgm_ops"), name=f"users_{field}_trgm_idx")
+        for field, expression in SEARCH_FIELDS.items()
+    ]
+
+
+def create_search_indexes(using="default"):
+    """Create the pg_trgm extension and the search indexes if they are missing."""
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        existing = connection.introspection.get_constraints(cursor, User._meta.db_table)
+    with connection.schema_editor() as schema_editor:
+        for index in search_indexes():
+            if index.name not in existing:
+                schema_editor.add_index(User, index)
+
+
+def trigrams(text):
+    """The trigram set pg_trgm extracts from ``text``."""
+    result = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def search_users(query, mode=CONTAINS, limit=10):
+    """
+    Return up to ``limit`` users matching ``query`` as dicts of
+    ``RESULT_FIELDS`` plus a ``score``, best match first.
+    """
+    term = query.strip().lower()
+    lookup = "startswith" if mode == PREFIX else "contains"
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f"search_{field}__{lookup}": term})
+    users = User.objects.filter(deleted_at__isnull=True).annotate(
+        **{f"search_{field}": expression for field, expression in SEARCH_FIELDS.items()}
+    ).filter(condition)
+
+    if connections[users.db].vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        score = Greatest(
+            *(TrigramSimilarity(f"search_{field}", term) for field in SEARCH_FIELDS)
+        )
+        return list(
+            users.annotate(score=score)
+            .order_by("-score", "email")
+            .values(*RESULT_FIELDS, "score")[:limit]
+        )
+
+    rows = list(users.values(*RESULT_FIELDS, *(f"search_{field}" for field in SEARCH_FIELDS)))
+    for row in rows:
+        row["score"] = max(
+            similarity(row.pop(f"search_{field}") or "", term) for field in SEARCH_FIELDS
+        )
+    rows.sort(key=lambda row: (-row["score"], row["email"]))
+    return rows[:limit]
@@ -0,0 +1,84 @@
+"""
+Read-only fast path from ``values()`` rows to response dicts.
+
+Instantiating a ``ModelSerializer`` per row (and running every field's
+``get_attribute``/``to_representation``) dominates list endpoints. A
+``RowMapper`` is compiled once per serializer class and field selection into a
+flat list of ``(key, column, convert)`` steps that reproduce the serializer's
+output for a ``values()`` dict: same keys in the same order, same
+representation for every value. String, UUID, boolean and integer fields are
+converted inline; other field types call the serializer field's own
+``to_representation``. The converted values are JSON-native, so DRF's
+``JSONRenderer`` encodes them entirely in the C encoder.
+
+Serializers with fields that are not a plain column (method fields, nested
+serializers, dotted sources) have no mapper; callers fall back to the
+serializer.
+"""
+
+import uuid
+from functools import lru_cache
+
+from rest_framework import serializers
+
+STRING_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.SlugField,
+    serializers.URLField,
+    serializers.RegexField,
+)
+
+
+def _related_pk(value):
+    # The serializer returns the pk object and the encoder stringifies UUIDs.
+    return str(value) if isinstance(value, uuid.UUID) else value
+
+
+def _converter(field):
+    """``value -> representation`` for a non-None column value, or None if unsupported."""
+    kind = type(field)
+    if kind in STRING_FIELDS:
+        return str
+    if kind is serializers.UUIDField and field.uuid_format == "hex_verbose":
+        return str
+    if kind is serializers.BooleanField:
+        return bool
+    if kind is serializers.IntegerField:
+        return int
+    if kind is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+        return _related_pk
+    if isinstance(field, (serializers.Serializer, serializers.ListSerializer)):
+        return None
+    if isinstance(field, (serializers.SerializerMethodField, serializers.RelatedField)):
+        return None
+    return field.to_representation
+
+
+class RowMapper:
+    def __init__(self, steps):
+        self.steps = steps
+        self.columns = [column for _, column, _ in steps]
+
+    def __call__(self, row):
+        return {
+            key: None if row[column] is None else convert(row[column])
+            for key, column, convert in self.steps
+        }
+
+
+@lru_cache(maxsize=256)
+def get_row_mapper(serializer_class, fields=None):
+    """
+    The ``RowMapper`` for ``serializer_class`` limited to ``fields`` (a tuple,
+    or None for every readable field), or None if it cannot be built.
+    """
+    steps = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only or (fields is not None and name not in fields):
+            continue
+        convert = _converter(field)
+        if convert is None or field.source == "*" or "." in field.source:
+            return None
+        steps.append((name, field.source, convert))
+    return RowMapper(steps)
@@ -0,0 +1,179 @@
+"""
+Client for the tenant service.
+
+All calls go through one ``requests.Session`` per client, so connections are
+pooled and kept alive instead of being opened per call. Every request has a
+connect and a read timeout, and idempotent GETs are retried on connection
+errors and 502/503/504 with exponential backoff plus jitter, so a fleet of
+workers does not retry in lockstep.
+
+Tenant metadata is cached per tenant id for ``ttl`` seconds. For another
+``stale_ttl`` seconds after that, a cached tenant is still returned at once
+while a background thread refetches it (stale-while-revalidate), so a slow or
+briefly unavailable tenant service does not add latency to our requests.
+
+Example Usage:
+    tenant = tenant_client.get_tenant(tenant_id)
+    tenants = tenant_client.get_tenants(tenant_ids)  # {tenant_id: tenant}
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from users.utils.cache.ttl import TTLCache, MISSING
+
+
+class TenantServiceError(Exception):
+    pass
+
+
+class TenantClient:
+    def __init__(
+        self,
+        base_url,
+        connect_timeout=1.0,
+        read_timeout=3.0,
+        retries=3,
+        backoff=0.2,
+        backoff_jitter=0.2,
+        pool_size=10,
+        ttl=300,
+        stale_ttl=600,
+        batch_size=100,
+        cache_alias=None,
+    ):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.timeout = (connect_timeout, read_timeout)
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.cache = TTLCache("tenants", ttl=ttl + stale_ttl, alias=cache_alias)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            backoff_jitter=backoff_jitter,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tenants")
+
+    def _get(self, path="", params=None):
+        try:
+            response = self.session.get(
+                self.base_url + path, params=params, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise TenantServiceError(f"Tenant service unreachable: {e}") from e
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise TenantServiceError(
+                f"Tenant service returned status {response.status_code}"
+            )
+        return response.json()
+
+    def _store(self, tenants):
+        now = time.time()
+        for tenant in tenants:
+            self.cache.set(str(tenant["id"]), (now, tenant))
+
+    def _revalidate(self, tenant_id):
+        with self._lock:
+            if tenant_id in self._refreshing:
+                return
+            self._refreshing.add(tenant_id)
+
+        def refresh():
+            try:
+                self.fetch_tenant(tenant_id)
+            except TenantServiceError:
+                pass  # keep serving the stale copy until it expires
+            finally:
+                with self._lock:
+                    self._refreshing.discard(tenant_id)
+
+        self._executor.submit(refresh)
+
+    def _cached(self, tenant_id):
+        """The cached tenant, or MISSING; schedules a refetch if it is stale."""
+        entry = self.cache.get(tenant_id)
+        if entry is MISSING:
+            return MISSING
+        fetched_at, tenant = entry
+        if time.time() - fetched_at >= self.ttl:
+            self._revalidate(tenant_id)
+        return tenant
+
+    def fetch_tenant(self, tenant_id):
+        """Fetch one tenant from the service, bypassing the cache."""
+        tenant = self._get(f"{tenant_id}/")
+        if tenant is None:
+            # The tenant is gone; stop serving a stale copy of it.
+            self.cache.delete(str(tenant_id))
+        else:
+            self._store([tenant])
+        return tenant
+
+    def get_tenant(self, tenant_id):
+        """The tenant's metadata, or None if the service does not know it."""
+        tenant = self._cached(str(tenant_id))
+        if tenant is MISSING:
+            tenant = self.fetch_tenant(str(tenant_id))
+        return tenant
+
+    def get_tenants(self, tenant_ids):
+        """
+        ``{tenant_id: tenant}`` for the known ``tenant_ids``. Tenants missing
+        from the cache are fetched ``batch_size`` at a time with ``?ids=``.
+        """
+        tenants, missing = {}, []
+        for tenant_id in dict.fromkeys(str(tenant_id) for tenant_id in tenant_ids):
+            tenant = self._cached(tenant_id)
+            if tenant is MISSING:
+                missing.append(tenant_id)
+            else:
+                tenants[tenant_id] = tenant
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            fetched = self._get(params={"ids": ",".join(batch)}) or []
+            self._store(fetched)
+            tenants.update((str(tenant["id"]), tenant) for tenant in fetched)
+        return tenants
+
+    def list_tenants(self):
+        """Every tenant, uncached (and priming the cache with each of them)."""
+        tenants = self._get() or []
+        self._store(tenants)
+        return tenants
+
+
+tenant_client = TenantClient(
+    settings.TENANT_SERVICE["URL"],
+    connect_timeout=settings.TENANT_SERVICE["CONNECT_TIMEOUT"],
+    read_timeout=settings.TENANT_SERVICE["READ_TIMEOUT"],
+    retries=settings.TENANT_SERVICE["RETRIES"],
+    backoff=settings.TENANT_SERVICE["BACKOFF"],
+    backoff_jitter=settings.TENANT_SERVICE["BACKOFF_JITTER"],
+    pool_size=settings.TENANT_SERVICE["POOL_SIZE"],
+    ttl=settings.TENANT_SERVICE["CACHE_TTL"],
+    stale_ttl=settings.TENANT_SERVICE["STALE_TTL"],
+    batch_size=settings.TENANT_SERVICE["BATCH_SIZE"],
+    cache_alias=settings.AUTH_CACHE["ALIAS"],
+)
@@ -0,0 +1,189 @@
+"""
+In-memory membership index for batch "is U a member of T, with which role?"
+checks.
+
+Each worker keeps, per tenant, a sorted ``array`` of user slots and a parallel
+``array`` of role slots. User and role UUIDs are interned to small integers
+once, so a tenant with n members costs about 8n bytes plus the shared intern
+tables, and a check is a ``bisect`` in its tenant's array. Per-tenant arrays
+are replaced, never mutated, and a rebuild swaps in a whole new ``Snapshot``,
+so lookups need no lock.
+
+``UserOrganization`` stays the source of truth. The first lookup loads every
+membership; after that, ``sync`` runs at most once per ``SYNC_INTERVAL``
+seconds and applies only what changed since the last sync:
+
+    * ``MembershipRemoval`` rows, written by the membership signals when a
+      membership is deleted or moved to another tenant, drop those members;
+    * memberships saved since then (by ``updated_at``) are upserted, after
+      the removals, so a member removed and added back stays in.
+
+Writes that bypass the signals or ``updated_at`` (``QuerySet.update`` or
+``delete``) are caught by a full rebuild every ``REBUILD_INTERVAL`` seconds,
+which also prunes removals too old for any sync to need.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from users.models import MembershipRemoval, UserOrganization
+
+EMPTY = (array("I"), array("I"))
+
+
+class Snapshot:
+    """Intern tables and per-tenant arrays; replaced wholesale on rebuild."""
+
+    def __init__(self):
+        self.user_slots = {}
+        self.role_slots = {None: 0}
+        self.roles = [None]
+        self.tenants = {}
+
+    def user_slot(self, user_id):
+        return self.user_slots.setdefault(user_id, len(self.user_slots))
+
+    def role_slot(self, role):
+        slot = self.role_slots.get(role)
+        if slot is None:
+            slot = self.role_slots[role] = len(self.roles)
+            self.roles.append(role)
+        return slot
+
+    def replace(self, tenant_id, members):
+        """Set the tenant's arrays from a ``{user_slot: role_slot}`` dict."""
+        users = sorted(members)
+        self.tenants[tenant_id] = (
+            array("I", users),
+            array("I", (members[user] for user in users)),
+        )
+
+    def upsert(self, tenant_id, members, removed=()):
+        """Add or update ``members`` after dropping the user slots in ``removed``."""
+        users, roles = self.tenants.get(tenant_id, EMPTY)
+        kept = {user: role for user, role in zip(users, roles) if user not in removed}
+        self.replace(tenant_id, {**kept, **members})
+
+    def lookup(self, user_id, tenant_id):
+        slot = self.user_slots.get(user_id)
+        if slot is None:
+            return False, None
+        users, roles = self.tenants.get(tenant_id, EMPTY)
+        position = bisect_left(users, slot)
+        if position < len(users) and users[position] == slot:
+            return True, self.roles[roles[position]]
+        return False, None
+
+
+class MembershipIndex:
+    def __init__(self, sync_interval, sync_overlap, rebuild_interval):
+        self.sync_interval = sync_interval
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._next_sync = 0.0
+        self._next_rebuild = 0.0
+        self._watermark = None
+        self._snapshot = Snapshot()
+
+    def _rows(self, **filters):
+        return (
+            UserOrganization.objects.filter(**filters)
+            .values_list("tenant_id", "user_id", "role", "updated_at")
+            .iterator(chunk_size=10000)
+        )
+
+    def _load(self, snapshot, rows, removed=None):
+        """
+        Upsert ``rows`` into ``snapshot``, first dropping the user slots in
+        ``removed`` (``{tenant_id: slots}``).
+        """
+        removed = removed or {}
+        tenants = {tenant_id: {} for tenant_id in removed}
+        for tenant_id, user_id, role, updated_at in rows:
+            members = tenants.setdefault(tenant_id, {})
+            members[snapshot.user_slot(user_id)] = snapshot.role_slot(role)
+            self._watermark = max(self._watermark, updated_at)
+        for tenant_id, members in tenants.items():
+            snapshot.upsert(tenant_id, members, removed.get(tenant_id, ()))
+
+    def _removed(self, snapshot, since):
+        """``{tenant_id: user slots}`` removed since ``since``."""
+        removed = {}
+        for tenant_id, user_id, created_at in MembershipRemoval.objects.filter(
+            created_at__gte=since
+        ).values_list("tenant_id", "user_id", "created_at"):
+            slot = snapshot.user_slots.get(user_id)
+            if slot is not None:
+                removed.setdefault(tenant_id, set()).add(slot)
+            self._watermark = max(self._watermark, created_at)
+        return removed
+
+    def _rebuild(self):
+        self._next_rebuild = time.monotonic() + self.rebuild_interval
+        self._next_sync = time.monotonic() + self.sync_interval
+        # Start from now even if the table is empty, so sync has a lower bound.
+        self._watermark = timezone.now()
+        # No worker's sync looks back further than its last rebuild minus the
+        # overlap, so removals older than two rebuild intervals are unused.
+        MembershipRemoval.objects.filter(
+            created_at__lt=self._watermark - 2 * timedelta(seconds=self.rebuild_interval)
+        ).delete()
+        snapshot = Snapshot()
+        self._load(snapshot, self._rows())
+        self._snapshot = snapshot
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild()
+
+    def _sync(self):
+        self._next_sync = time.monotonic() + self.sync_interval
+        if self._watermark is None:
+            return
+        snapshot = self._snapshot
+        since = self._watermark - self.sync_overlap
+        removed = self._removed(snapshot, since)
+        self._load(snapshot, self._rows(updated_at__gte=since), removed)
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_sync and now < self._next_rebuild:
+            return
+        with self._lock:
+            if time.monotonic() >= self._next_rebuild:
+                self._rebuild()
+            elif force or time.monotonic() >= self._next_sync:
+                self._sync()
+
+    def check(self, pairs):
+        """``[(is_member, role), ...]`` for ``(user_id, tenant_id)`` pairs, in order."""
+        self.sync()
+        snapshot = self._snapshot
+        return [snapshot.lookup(user_id, tenant_id) for user_id, tenant_id in pairs]
+
+    def __len__(self):
+        return sum(len(users) for users, _ in self._snapshot.tenants.values())
+
+
+def record_removals(memberships):
+    """Log ``(tenant_id, user_id)`` memberships that were deleted or moved away."""
+    MembershipRemoval.objects.bulk_create(
+        [
+            MembershipRemoval(tenant_id=tenant_id, user_id=user_id)
+            for tenant_id, user_id in memberships
+        ]
+    )
+
+
+membership_index = MembershipIndex(
+    sync_interval=settings.MEMBERSHIP_INDEX["SYNC_INTERVAL"],
+    sync_overlap=settings.MEMBERSHIP_INDEX["SYNC_OVERLAP"],
+    rebuild_interval=settings.MEMBERSHIP_INDEX["REBUILD_INTERVAL"],
+)
@@ -0,0 +1,87 @@
+"""
+Tenant member directory.
+
+Members are listed from the ``(tenant_id, created_at, id)`` index on
+``UserOrganization`` joined to a few user columns, oldest membership first, and
+paged with a keyset cursor (see ``users.pagination``). Users waiting to be
+purged are hidden from the listing but counted until their memberships go.
+
+Member counts come from ``TenantMemberCount``, one row per tenant. Single
+membership writes adjust it from the signals in ``users/signals.py``; the bulk
+writers, which skip signals, call ``adjust_member_counts`` themselves. The
+``count_tenant_members`` command rebuilds the counters from scratch.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from users.models import TenantMemberCount, UserOrganization
+
+MEMBER_FIELDS = {
+    "id": "id",
+    "created_at": "created_at",
+    "user_id": "user_id",
+    "email": "user__email",
+    "username": "user__username",
+    "first_name": "user__first_name",
+    "last_name": "user__last_name",
+    "role": "role",
+}
+
+
+def tenant_members(tenant_id):
+    """Rows of ``MEMBER_FIELDS`` for the tenant's active members, unordered."""
+    return (
+        UserOrganization.objects.filter(tenant_id=tenant_id, user__deleted_at__isnull=True)
+        .annotate(**{name: F(path) for name, path in MEMBER_FIELDS.items() if name != path})
+        .values(*MEMBER_FIELDS)
+    )
+
+
+def member_count(tenant_id):
+    return (
+        TenantMemberCount.objects.filter(tenant_id=tenant_id)
+        .values_list("member_count", flat=True)
+        .first()
+        or 0
+    )
+
+
+def adjust_member_counts(deltas):
+    """Add ``deltas[tenant_id]`` to each tenant's counter, creating it if needed."""
+    now = timezone.now()
+    for tenant_id, delta in deltas.items():
+        if not delta:
+            continue
+        counters = TenantMemberCount.objects.filter(tenant_id=tenant_id)
+        if counters.update(member_count=F("member_count") + delta, updated_at=now):
+            continue
+        with transaction.atomic():
+            _, created = TenantMemberCount.objects.get_or_create(
+                tenant_id=tenant_id, defaults={"member_count": delta}
+            )
+        if not created:
+            # Another writer created the counter in the meantime.
+            counters.update(member_count=F("member_count") + delta, updated_at=now)
+
+
+def recount_members():
+    """Rebuild every counter from ``UserOrganization``; returns the number of tenants."""
+    counts = dict(
+        UserOrganization.objects.values("tenant_id")
+        .annotate(total=Count("id"))
+        .values_list("tenant_id", "total")
+    )
+    with transaction.atomic():
+        TenantMemberCount.objects.exclude(tenant_id__in=counts).delete()
+        TenantMemberCount.objects.bulk_create(
+            [
+                TenantMemberCount(tenant_id=tenant_id, member_count=total)
+                for tenant_id, total in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["tenant_id"],
+            update_fields=["member_count", "updated_at"],
+        )
+    return len(counts)
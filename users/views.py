@@ -1,14 +1,36 @@
-from time import sleep
-
 from django.utils import timezone
 from rest_framework.status import *
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import Token
+from .utils.auth.tokens import RefreshToken, AccessToken
+from .utils.auth.revocation import revoke_token
 from rest_framework import generics, permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from .utils.location.client import get_client_ip, get_location_from_ip
+from .utils.auth.sessions import invalidate_sessions
+from .utils.auth.epoch import bump_token_epoch
+from .utils.auth.keys import get_jwks
+from .utils.auth.introspection import introspect
+from .authentication import ServiceAuthentication
+from .utils.auth.hashing import HashingUnavailable
+from .utils.auth.login import persist_login
+from .utils.auth.refresh import coalesced_refresh, RefreshFailed
+from .pagination import KeysetPagination, TenantMemberPagination
+from .fieldsets import FastListMixin, requested_fields, only_columns
+from .utils.cache import etags
+from django.db import transaction
+from .utils.search.users import search_users
+from .utils.export.users import FORMATS, export_rows
+from .utils.provisioning.users import provision_users
+from .utils.accounts.deletion import tombstone_user
+from .utils.accounts.offboarding import request_offboarding
+from .utils.tenants.members import member_count, tenant_members
+from .utils.tenants.index import membership_index
+from django.http import StreamingHttpResponse
+from .utils.auth.throttle import LoginThrottle, login_identifier, login_identifier_limiter
+from django.utils.cache import patch_cache_control
 from django.contrib.auth import get_user_model
 from rest_framework.decorators import action
 from rest_framework import status
@@ -27,17 +49,35 @@ class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        user_id = request.user.pk
+        return etags.conditional_get(
+            request,
+            etags.PROFILE,
+            user_id,
+            lambda: (etags.user_version(user_id), None),
+            lambda: UserSerializer(request.user).data,
+        )
 
     def put(self, request):
         """Fully update user profile (all fields required)."""
-        user = request.user
-        serializer = UserSerializer(user, data=request.data, partial=True)
+        with transaction.atomic():
+            # Lock the row so an If-Match check cannot race another update
+            user = User.objects.select_for_update().get(pk=request.user.pk)
+            failed = etags.check_preconditions(
+                request, etags.PROFILE, user.pk, user.data_version
+            )
+            if failed is not None:
+                return failed
+            serializer = UserSerializer(user, data=request.data, partial=True)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            if serializer.is_valid():
+                serializer.save()
+                return etags.with_etag(
+                    Response(serializer.data, status=status.HTTP_200_OK),
+                    etags.PROFILE,
+                    user.pk,
+                    user.data_version,
+                )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -45,10 +85,26 @@ class UserSettingsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        fields = requested_fields(request, UserSettingsSerializer)
+        settings = UserSettings.objects.all()
+        if fields is not None:
+            columns = only_columns(UserSettings, UserSettingsSerializer, fields)
+            settings = settings if columns is None else settings.only(*columns)
+
+        def validators():
+            version, updated_at = UserSettings.objects.values_list(
+                "user__data_version", "updated_at"
+            ).get(user=request.user)
+            return version, updated_at.timestamp()
+
+        def build():
+            instance = settings.get(user=request.user)
+            return UserSettingsSerializer(instance, fields=fields).data
+
         try:
-            settings = UserSettings.objects.get(user=request.user)
-            serializer = UserSettingsSerializer(settings)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return etags.conditional_get(
+                request, etags.SETTINGS, request.user.pk, validators, build
+            )
         except UserSettings.DoesNotExist:
             return Response(
                 {"error": "User settings not found"},
@@ -58,14 +114,35 @@ class UserSettingsView(APIView):
     def put(self, request):
         """Allow both partial and full updates."""
         try:
-            settings = UserSettings.objects.get(user=request.user)
-            serializer = UserSettingsSerializer(
-                settings, data=request.data, partial=True
-            )
+            with transaction.atomic():
+                # Lock the rows so an If-Match check cannot race another update
+                settings = (
+                    UserSettings.objects.select_related("user")
+                    .select_for_update()
+                    .get(user=request.user)
+                )
+                failed = etags.check_preconditions(
+                    request,
+                    etags.SETTINGS,
+                    request.user.pk,
+                    settings.user.data_version,
+                    settings.updated_at.timestamp(),
+                )
+                if failed is not None:
+                    return failed
+                serializer = UserSettingsSerializer(
+                    settings, data=request.data, partial=True
+                )
 
-            if serializer.is_valid():
-                serializer.save()
-                return Response(serializer.data, status=status.HTTP_200_OK)
+                if serializer.is_valid():
+                    serializer.save()
+                    return etags.with_etag(
+                        Response(serializer.data, status=status.HTTP_200_OK),
+                        etags.SETTINGS,
+                        request.user.pk,
+                        etags.user_version(request.user.pk),
+                        settings.updated_at.timestamp(),
+                    )
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except UserSettings.DoesNotExist:
             return Response(
@@ -87,6 +164,8 @@ class UserCreationView(APIView):
                 response = Response(response_data, status=status.HTTP_201_CREATED)
                 return response
 
+            except HashingUnavailable:
+                raise
             except Exception as e:
                 return Response(
                     {"error": f"User creation failed: {str(e)}"},
@@ -103,7 +182,12 @@ class LogoutAllView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        UserSession.objects.filter(user=request.user).delete()
+        sessions = UserSession.objects.filter(user=request.user)
+        session_ids = list(sessions.values_list("session_id", flat=True))
+        sessions.delete()
+        invalidate_sessions(session_ids)
+        # Outstanding access tokens stop authenticating as well
+        bump_token_epoch(request.user.pk)
         return Response({"message": "Logged out from all devices"}, status=200)
 
 
@@ -119,9 +203,19 @@ class LogoutView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Attempt to blacklist the refresh token
-            token = RefreshToken(refresh_token)
-            token.blacklist()
+            # End the current session before revoking its refresh token
+            session_id = request.COOKIES.get("session_id")
+            if session_id:
+                UserSession.objects.filter(session_id=session_id).delete()
+                invalidate_sessions([session_id])
+
+            # Revoke the refresh token and the access token used for this call
+            revoke_token(RefreshToken(refresh_token))
+            if isinstance(request.auth, Token):
+                revoke_token(request.auth)
+            elif request.auth:
+                revoke_token(AccessToken(request.auth))
+
             response = Response(
                 {"message": "Successfully logged out"},
                 status=status.HTTP_205_RESET_CONTENT,
@@ -133,11 +227,6 @@ class LogoutView(APIView):
 
             return response
 
-        except AttributeError:
-            return Response(
-                {"error": "Token blacklisting is not enabled in your settings"},
-                status=status.HTTP_501_NOT_IMPLEMENTED,
-            )
         except Exception as e:
             return Response(
                 {"error": f"Invalid token - {str(e)}"},
@@ -147,6 +236,7 @@ class LogoutView(APIView):
 
 class LoginView(TokenObtainPairView):
     serializer_class = GetTokenPairSerializer
+    throttle_classes = [LoginThrottle]
 
     def post(self, request, *args, **kwargs):
         """
@@ -155,50 +245,26 @@ class LoginView(TokenObtainPairView):
         serializer = self.get_serializer(data=request.data)
         try:
             serializer.is_valid(raise_exception=True)
+        except HashingUnavailable:
+            raise
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        # A successful login restores the identifier's budget
+        login_identifier_limiter.reset(login_identifier(request))
+
         validated_data = serializer.validated_data
         user = validated_data["user"]
-        user.last_login = timezone.now()
-        user.save(update_fields=["last_login"])
-
         refresh = validated_data["refresh"]
         access_token = validated_data["access"]
 
-        ip_address, _ = IpAddress.objects.get_or_create(ip_address=get_client_ip(request))
-        user_agent = request.headers.get("User-Agent")
-
-        try:
-            # Check if session already exists for the same user & device
-            session, created = UserSession.objects.get_or_create(
-                user=user,
-                user_agent=user_agent,
-                ip_address=ip_address,
-                defaults={
-                    "session_id": uuid.uuid4(),
-                    "refresh_token": refresh,
-                    "expires_at": timezone.now() + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"],
-                },
-            )
-
-            if not created:
-                # If session already exists, update the tokens and expiration time
-                session.refresh_token = refresh
-                session.expires_at = timezone.now() + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"]
-                session.save()
-
-        except UserSession.MultipleObjectsReturned:
-            # If multiple sessions exist, delete all and create a new one
-            UserSession.objects.filter(user=user, user_agent=user_agent).delete()
-            session = UserSession.objects.create(
-                user=user,
-                user_agent=user_agent,
-                ip_address=ip_address,
-                session_id=uuid.uuid4(),
-                refresh_token=refresh,
-                expires_at=timezone.now() + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"],
-            )
+        session = persist_login(
+            user,
+            refresh,
+            validated_data["ip_address"],
+            validated_data["ip_address_id"],
+            request.headers.get("User-Agent"),
+        )
 
         response_data = {"message": "Login successful"}
         # Return tokens if it's a mobile client or in DEBUG mode
@@ -246,64 +312,33 @@ class RefreshTokenView(TokenRefreshView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Validate session using session_id
         try:
-            session = UserSession.objects.get(session_id=session_id)
-            if session.is_expired:
-                return Response(
-                    {"error": "Session expired"}, status=status.HTTP_401_UNAUTHORIZED
-                )
-            if is_mobile and session.refresh_token != refresh_token:
-                return Response(
-                    {"error": "Invalid refresh token for mobile"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-        except UserSession.DoesNotExist:
-            return Response(
-                {"error": "Invalid session"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # Rotate refresh token if mobile
-        if is_mobile:
-            try:
-                refresh = RefreshToken(refresh_token)
-                new_refresh_token = str(refresh)
-                session.refresh_token = new_refresh_token
-                session.expires_at = timezone.now() + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"]
-                session.save()
-            except Exception as e:
-                return Response({"error": f"Invalid refresh token: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            try:
-                if not session.refresh_token:
-                    return Response({"error": "Session refresh token is missing"}, status=status.HTTP_400_BAD_REQUEST)
-                refresh = RefreshToken(session.refresh_token)
-            except Exception as e:
-                return Response({"error": f"Invalid session refresh token: {str(e)}"},
-                                status=status.HTTP_400_BAD_REQUEST)
+            result = coalesced_refresh(session_id, refresh_token, is_mobile)
+        except RefreshFailed as e:
+            return Response({"error": e.error}, status=e.status_code)
 
+        access_token = result["access"]
         response_data = {
             "message": "Token refreshed successfully",
-            "access": str(refresh.access_token),
+            "access": access_token,
         }
 
         if is_mobile:
-            response_data["refresh"] = new_refresh_token
+            response_data["refresh"] = result["refresh"]
 
         response = Response(response_data, status=status.HTTP_200_OK)
 
         # Set session cookies for web clients
         response.set_cookie(
             key="cc_access",
-            value=str(refresh.access_token),
+            value=access_token,
             httponly=True,
             secure=not settings.DEBUG,
             samesite="Lax",
         )
         response.set_cookie(
             key="session_id",
-            value=str(session.session_id),
+            value=result["session_id"],
             httponly=True,
             secure=not settings.DEBUG,
             samesite="Lax",
@@ -312,7 +347,73 @@ class RefreshTokenView(TokenRefreshView):
         return response
 
 
-class UserTenantView(viewsets.ModelViewSet):
+class JWKSView(APIView):
+    """
+    Publishes the public JWT signing keys so other services can verify tokens
+    locally (see users/utils/auth/verifier.py).
+    """
+
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        response = Response(get_jwks(), status=status.HTTP_200_OK)
+        patch_cache_control(
+            response, public=True, max_age=settings.JWT_SIGNING["JWKS_MAX_AGE"]
+        )
+        return response
+
+
+class IntrospectionView(APIView):
+    """
+    Validates a batch of access tokens and/or session ids in one call.
+    Results are returned in request order. Only peer services may call it.
+    """
+
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [ServiceAuthentication]
+
+    def post(self, request):
+        serializer = IntrospectionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            introspect(**serializer.validated_data), status=status.HTTP_200_OK
+        )
+
+
+class MembershipCheckView(APIView):
+    """
+    Answers a batch of "is this user a member of this tenant, and with which
+    role?" questions from the in-memory membership index. Results are
+    returned in request order. Only peer services may call it.
+    """
+
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [ServiceAuthentication]
+
+    def post(self, request):
+        serializer = MembershipCheckSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        pairs = serializer.validated_data["pairs"]
+        results = [
+            {
+                "user_id": str(user_id),
+                "tenant_id": str(tenant_id),
+                "member": member,
+                "role": role and str(role),
+            }
+            for (user_id, tenant_id), (member, role) in zip(
+                pairs, membership_index.check(pairs)
+            )
+        ]
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class UserTenantView(FastListMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     serializer_class = UserTenantSerializer
     queryset = UserOrganization.objects.all()
@@ -321,9 +422,22 @@ class UserTenantView(viewsets.ModelViewSet):
         return self.queryset.filter(user=self.request.user)
 
     def list(self, request, *args, **kwargs):
-        tenants = self.get_queryset()
-        serializer = self.get_serializer(tenants, many=True)
-        return Response(serializer.data)
+        user_id = request.user.pk
+
+        def build():
+            tenants = self.filter_queryset(self.get_queryset())
+            response = self.fast_list(tenants)
+            if response is not None:
+                return response.data
+            return self.get_serializer(tenants, many=True).data
+
+        return etags.conditional_get(
+            request,
+            etags.TENANTS,
+            user_id,
+            lambda: (etags.user_version(user_id), None),
+            build,
+        )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(
@@ -372,13 +486,60 @@ class UserTenantView(viewsets.ModelViewSet):
             status=status.HTTP_200_OK,
         )
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="members",
+        permission_classes=[IsAuthenticated],
+    )
+    def members(self, request, pk=None):
+        """List a tenant's members, oldest first, with the member count"""
+        try:
+            tenant_id = uuid.UUID(pk)
+        except ValueError:
+            return Response({"error": "Tenant not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not (
+            request.user.is_staff
+            or UserOrganization.objects.filter(user=request.user, tenant_id=tenant_id).exists()
+        ):
+            return Response(
+                {"error": "You are not a member of this tenant"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
-class UserViewSet(viewsets.ModelViewSet):
+        paginator = TenantMemberPagination()
+        page = paginator.paginate_queryset(
+            tenant_members(tenant_id), request, view=self, count=member_count(tenant_id)
+        )
+        return paginator.get_paginated_response(TenantMemberSerializer(page, many=True).data)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="offboard",
+        permission_classes=[permissions.IsAdminUser],
+    )
+    def offboard(self, request):
+        """Remove every member of a tenant; the memberships are removed in the background."""
+        serializer = OffboardTenantSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        offboarding = request_offboarding(
+            serializer.validated_data["tenant_id"], requested_by=request.user.pk
+        )
+        return Response(
+            TenantOffboardingSerializer(offboarding).data,
+            status=status.HTTP_200_OK if offboarding.completed_at else status.HTTP_202_ACCEPTED,
+        )
+
+
+class UserViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    sparse_fieldset_columns = ["date_joined"]
 
     def get_queryset(self):
-        return User.objects.all()
+        return User.objects.filter(deleted_at__isnull=True)
 
     @action(detail=False, methods=["get"], url_path="filter")
     def filter_users(self, request):
@@ -395,19 +556,87 @@ class UserViewSet(viewsets.ModelViewSet):
         if is_active is not None:
             filters["is_active"] = is_active.lower() == "true"
 
-        users = User.objects.filter(**filters)
-        serializer = self.get_serializer(users, many=True)
-        return Response(serializer.data)
+        users = self.filter_queryset(self.get_queryset()).filter(**filters)
+        response = self.fast_list(users)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(self.paginate_queryset(users), many=True)
+        return self.get_paginated_response(serializer.data)
 
     def list(self, request, *args, **kwargs):
-        print(request.user.id)
-        print(request.user)
-        print(request.headers)
-        # print(request.user.email)
-        sleep(2)
-        queryset = self.get_queryset().order_by("-date_joined")
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=HTTP_200_OK)
+        response = self.fast_list(self.filter_queryset(self.get_queryset()))
+        if response is not None:
+            return response
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """Ranked substring or prefix search over email, username and full name"""
+        serializer = UserSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        results = search_users(
+            serializer.validated_data["q"],
+            mode=serializer.validated_data["mode"],
+            limit=serializer.validated_data["limit"],
+        )
+        return Response({"results": results})
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_provision(self, request):
+        """Create many users in a tenant the caller belongs to"""
+        serializer = BulkProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tenant_id = serializer.validated_data["tenant_id"]
+        if not UserOrganization.objects.filter(
+            user_id=request.user.pk, tenant_id=tenant_id
+        ).exists():
+            return Response(
+                {"error": "You are not a member of this tenant"},
+                status=HTTP_403_FORBIDDEN,
+            )
+
+        rows, results = [], []
+        for index, data in enumerate(serializer.validated_data["users"]):
+            row = BulkUserRowSerializer(data=data)
+            if row.is_valid():
+                rows.append((index, row.validated_data))
+            else:
+                results.append({"index": index, "status": "error", "errors": row.errors})
+
+        for (index, _), result in zip(
+            rows, provision_users([data for _, data in rows], tenant_id)
+        ):
+            results.append({**result, "index": index})
+        results.sort(key=lambda result: result["index"])
+
+        created = sum(result["status"] == "created" for result in results)
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=HTTP_201_CREATED if created == len(results) else HTTP_207_MULTI_STATUS,
+        )
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """Stream every user (or a tenant's members) as NDJSON or CSV"""
+        # "format" is taken by DRF's format suffix override
+        output = request.query_params.get("output", "ndjson")
+        if output not in FORMATS:
+            return Response(
+                {"error": f"output must be one of: {', '.join(sorted(FORMATS))}"},
+                status=HTTP_400_BAD_REQUEST,
+            )
+        tenant_id = request.query_params.get("tenant_id")
+        try:
+            tenant_id = tenant_id and uuid.UUID(tenant_id)
+        except ValueError:
+            return Response({"error": "Invalid tenant_id"}, status=HTTP_400_BAD_REQUEST)
+
+        encode, content_type = FORMATS[output]
+        response = StreamingHttpResponse(
+            encode(export_rows(tenant_id)), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="users.{output}"'
+        return response
 
     def create(self, request, *args, **kwargs):
         """Create a new user from Organization"""
@@ -428,13 +657,13 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=HTTP_400_BAD_REQUEST)
 
     def destroy(self, request, pk=None, *args, **kwargs):
-        """Delete a user by ID."""
-        sleep(3)
+        """Delete a user by ID; their data is purged in the background."""
         try:
             user = self.get_queryset().get(pk=pk)
-            user.delete()
+            deletion = tombstone_user(user, requested_by=request.user.pk)
             return Response(
-                {"message": "User deleted successfully"}, status=HTTP_204_NO_CONTENT
+                {"message": "User scheduled for deletion", "deletion_id": deletion.pk},
+                status=HTTP_202_ACCEPTED,
             )
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=HTTP_404_NOT_FOUND)